@@ -0,0 +1,112 @@
+import os
+from array import array
+import hashlib
+import mmap
+import struct
+import sys
+import tempfile
+import threading
+from pathlib import Path
+from logger import setup_logger
+
+logger = setup_logger(__name__)
+
+HASH_SIZE = 8
+HASH_FORMAT = '<Q'
+
+
+def url_hash(url):
+    """64-bit hash of a (canonical) URL"""
+    return struct.unpack(HASH_FORMAT, hashlib.blake2b(url.encode('utf-8'), digest_size=HASH_SIZE).digest())[0]
+
+
+class ArchiveIndex:
+    """Compact membership index for archived article URLs.
+
+    Stores a sorted array of 64-bit URL hashes (8 bytes per article, no URL
+    strings) in a file that is memory-mapped and binary-searched, so opening
+    it is O(1) and memory use doesn't grow with the archive. With 64-bit
+    hashes, a false "already processed" is about a 1 in 10^7 chance even at
+    a million archived articles.
+    """
+
+    def __init__(self, index_file):
+        self.index_file = Path(index_file)
+        self.lock = threading.Lock()
+        self.file = None
+        self.map = None
+        self.size = 0
+        self._open()
+
+    def _open(self):
+        self._close()
+        if not self.index_file.exists() or self.index_file.stat().st_size == 0:
+            return
+        self.file = open(self.index_file, 'rb')
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.size = len(self.map) // HASH_SIZE
+
+    def _close(self):
+        if self.map is not None:
+            self.map.close()
+            self.file.close()
+        self.file = None
+        self.map = None
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def __contains__(self, url):
+        return self.contains_hash(url_hash(url))
+
+    def contains_hash(self, value):
+        with self.lock:
+            low, high = 0, self.size
+            while low < high:
+                mid = (low + high) // 2
+                current = struct.unpack_from(HASH_FORMAT, self.map, mid * HASH_SIZE)[0]
+                if current < value:
+                    low = mid + 1
+                elif current > value:
+                    high = mid
+                else:
+                    return True
+            return False
+
+    def add(self, urls):
+        """Merge URLs into the index, rewriting the file atomically. Returns the new size."""
+        new_hashes = {url_hash(url) for url in urls}
+        if not new_hashes:
+            return self.size
+
+        with self.lock:
+            merged = array('Q')
+            if self.map is not None:
+                merged.frombytes(self.map[:])
+                if sys.byteorder == 'big':
+                    merged.byteswap()
+            merged = array('Q', sorted(set(merged) | new_hashes))
+            # The file is always little-endian to match HASH_FORMAT
+            if sys.byteorder == 'big':
+                merged.byteswap()
+
+            fd, tmp_path = tempfile.mkstemp(dir=self.index_file.parent, prefix=f".{self.index_file.name}.")
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    merged.tofile(f)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.index_file)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.unlink(tmp_path)
+                raise
+            self._open()
+
+        logger.info(f"Archive index now holds {self.size} articles")
+        return self.size
+
+    def close(self):
+        with self.lock:
+            self._close()
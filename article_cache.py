@@ -1,94 +1,204 @@
 import os
 from datetime import datetime, timedelta
 import json
-import logging
+import sqlite3
+import threading
+import time
 from pathlib import Path
+from archive_index import ArchiveIndex
+from config import CACHE_FLUSH_EVERY, CACHE_FLUSH_INTERVAL
+from metrics import CACHE_LOOKUPS
+from url_utils import canonicalize_url
+from logger import setup_logger
 
-logger = logging.getLogger(__name__)
+logger = setup_logger(__name__)
+
+# Version 2: canonical URLs, archived entries moved to the archive index
+SCHEMA_VERSION = 2
 
 class ArticleCache:
-    def __init__(self, 
-                 cache_file='articles/processed/processed_articles.json', 
-                 archive_file='articles/processed/archived_processed_articles.json'):
+    """Processed-article store backed by SQLite in WAL mode.
+
+    Every insert is a single indexed write instead of a rewrite of the whole
+    cache, and lookups by URL or processed date go through indexes rather
+    than an in-memory copy of every URL ever processed. New articles are
+    buffered and committed in one transaction every flush_every articles
+    or flush_interval seconds, and on flush() / close().
+
+    URLs are canonicalized before they are stored or looked up. Only the
+    active window lives in the database; archived entries are kept as
+    8-byte hashes in a memory-mapped ArchiveIndex, so startup memory and
+    time stay flat however large the archive grows.
+    """
+
+    def __init__(self,
+                 cache_file='articles/processed/processed_articles.json',
+                 archive_file='articles/processed/archived_processed_articles.json',
+                 flush_every=CACHE_FLUSH_EVERY,
+                 flush_interval=CACHE_FLUSH_INTERVAL):
         # Use absolute paths
         base_dir = os.environ.get('STORAGE_PATH', '/app/articles')
+        self.db_file = Path(base_dir) / 'processed' / 'processed_articles.db'
+        # Legacy JSON caches, only read once to migrate them
         self.cache_file = Path(base_dir) / 'processed' / 'processed_articles.json'
         self.archive_file = Path(base_dir) / 'processed' / 'archived_processed_articles.json'
-        
+        self.archive_index = ArchiveIndex(Path(base_dir) / 'processed' / 'archived_urls.idx')
+
         # Create directories
-        os.makedirs(self.cache_file.parent, exist_ok=True)
-        
-        # Load cache
-        self.cache = self._load_cache(self.cache_file)
-        self.archive = self._load_cache(self.archive_file)
-        self.cached_articles = set(self.cache.keys()) | set(self.archive.keys())
-        
+        os.makedirs(self.db_file.parent, exist_ok=True)
+
+        self.flush_every = max(1, flush_every)
+        self.flush_interval = flush_interval
+        self.pending = {}
+        self.last_flush = time.monotonic()
+
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(self.db_file, check_same_thread=False)
+        self._create_schema()
+        self._upgrade_schema()
+        self._migrate_json(self.cache_file, archived=False)
+        self._migrate_json(self.archive_file, archived=True)
+
         # Log cache status
-        logger.info(f"Loaded {len(self.cached_articles)} cached articles from {self.cache_file}")
-        logger.info(f"First few cached URLs: {list(self.cached_articles)[:3]}")
-
-    def _load_cache(self, filename):
-        """Load cache from file, creating it if it doesn't exist"""
-        if os.path.exists(filename):
-            try:
-                with open(filename, 'r') as f:
-                    return json.load(f)
-            except json.JSONDecodeError:
-                return {}
-        return {}
-
-    def _save_cache(self, data, filename):
-        """Save cache to file with pretty formatting"""
-        with open(filename, 'w') as f:
-            json.dump(
-                data,
-                f,
-                indent=2,
-                sort_keys=True
+        logger.info(f"Opened article cache with {self.count()} processed articles at {self.db_file}")
+
+    def _create_schema(self):
+        with self.lock, self.conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS articles (
+                    url TEXT PRIMARY KEY,
+                    processed_at TEXT NOT NULL,
+                    archived INTEGER NOT NULL DEFAULT 0
+                )
+            """)
+            self.conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_articles_processed_date ON articles (processed_at)"
+            )
+
+    def _upgrade_schema(self):
+        """Canonicalize URLs stored by older versions and move archived rows to the archive index"""
+        with self.lock:
+            version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+            if version >= SCHEMA_VERSION:
+                return
+            rows = self.conn.execute("SELECT url, processed_at, archived FROM articles").fetchall()
+
+        archived = [canonicalize_url(url) for url, _, is_archived in rows if is_archived]
+        self.archive_index.add(archived)
+
+        with self.lock, self.conn:
+            self.conn.execute("DROP INDEX IF EXISTS idx_articles_processed_at")
+            self.conn.execute("DELETE FROM articles")
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO articles (url, processed_at) VALUES (?, ?)",
+                ((canonicalize_url(url), processed_at) for url, processed_at, is_archived in rows if not is_archived)
             )
+            self.conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        if rows:
+            logger.info(f"Upgraded article cache: canonicalized {len(rows)} URLs, archived {len(archived)}")
+
+    def _migrate_json(self, filename, archived):
+        """Import a legacy JSON cache file once, then rename it out of the way"""
+        if not os.path.exists(filename):
+            return
+        try:
+            with open(filename, 'r') as f:
+                entries = json.load(f)
+        except json.JSONDecodeError as e:
+            logger.error(f"Could not migrate corrupt cache file {filename}: {e}")
+            return
+
+        if archived:
+            self.archive_index.add(canonicalize_url(url) for url in entries)
+        else:
+            with self.lock, self.conn:
+                self.conn.executemany(
+                    "INSERT OR IGNORE INTO articles (url, processed_at) VALUES (?, ?)",
+                    ((canonicalize_url(url), processed_date) for url, processed_date in entries.items())
+                )
+        os.replace(filename, f"{filename}.migrated")
+        logger.info(f"Migrated {len(entries)} entries from {filename} to {self.db_file}")
+
+    def count(self):
+        """Number of processed articles, including archived ones"""
+        self.flush()
+        with self.lock:
+            active = self.conn.execute("SELECT COUNT(*) FROM articles").fetchone()[0]
+        return active + len(self.archive_index)
 
     def add_article(self, article_link):
-        """Add article to cache and cached_articles set"""
+        """Record an article as processed; it is committed with the next batch"""
         now = datetime.now().isoformat()
-        self.cache[article_link] = now
-        self.cached_articles.add(article_link)
-        self._save_cache(self.cache, self.cache_file)
-        logger.info(f"Added new article to cache: {article_link}")
+        with self.lock:
+            self.pending[canonicalize_url(article_link)] = now
+            flush_due = (len(self.pending) >= self.flush_every or
+                         time.monotonic() - self.last_flush >= self.flush_interval)
+        logger.debug("Added new article to cache: %s", article_link)
+        if flush_due:
+            self.flush()
+
+    def flush(self):
+        """Commit all buffered articles in a single transaction"""
+        with self.lock:
+            rows = list(self.pending.items())
+            if rows:
+                with self.conn:
+                    self.conn.executemany(
+                        "INSERT OR REPLACE INTO articles (url, processed_at) VALUES (?, ?)",
+                        rows
+                    )
+                self.pending.clear()
+            self.last_flush = time.monotonic()
+        if rows:
+            logger.info(f"Committed {len(rows)} articles to cache")
+        return len(rows)
 
     def is_processed(self, url):
         """Check if an article URL has been processed (in either cache or archive)"""
-        return url in self.cache or url in self.archive
+        url = canonicalize_url(url)
+        with self.lock:
+            row = url in self.pending or self.conn.execute(
+                "SELECT 1 FROM articles WHERE url = ?", (url,)
+            ).fetchone()
+        processed = bool(row) or url in self.archive_index
+        CACHE_LOOKUPS.inc(cache='article', result='hit' if processed else 'miss')
+        return processed
 
     def archive_old_entries(self, days=30):
         """Move entries older than specified days to archive"""
-        cutoff = datetime.now() - timedelta(days=days)
-        entries_to_archive = {}
-        current_entries = {}
-
-        # Separate entries into current and to-be-archived
-        for url, processed_date in self.cache.items():
-            if datetime.fromisoformat(processed_date) < cutoff:
-                entries_to_archive[url] = processed_date
-            else:
-                current_entries[url] = processed_date
-
-        # Update archive with new old entries
-        self.archive.update(entries_to_archive)
-        
-        # Update cache to only contain current entries
-        self.cache = current_entries
-
-        # Save both files
-        self._save_cache(self.cache, self.cache_file)
-        self._save_cache(self.archive, self.archive_file)
-        
-        return len(entries_to_archive)
+        self.flush()
+        cutoff = (datetime.now() - timedelta(days=days)).isoformat()
+        with self.lock:
+            urls = [row[0] for row in self.conn.execute(
+                "SELECT url FROM articles WHERE processed_at < ?", (cutoff,)
+            )]
+
+        # Index first: a crash in between leaves entries in both tiers, never in neither
+        self.archive_index.add(urls)
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM articles WHERE processed_at < ?", (cutoff,))
+        return len(urls)
 
     def is_cached(self, article_link):
         """Check if an article URL has been processed"""
-        is_cached = article_link in self.cached_articles
+        is_cached = self.is_processed(article_link)
         if is_cached:
-            logger.info(f"Found cached article: {article_link}")
+            logger.debug("Found cached article: %s", article_link)
         else:
-            logger.debug(f"New article found: {article_link}")
-        return is_cached
\ No newline at end of file
+            logger.debug("New article found: %s", article_link)
+        return is_cached
+
+    def close(self):
+        """Commit buffered articles and close the database"""
+        self.flush()
+        with self.lock:
+            self.conn.close()
+        self.archive_index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,95 @@
+"""Time rendering the digest email for small and very large digests.
+
+Renders the HTML and plain-text templates for synthetic digests and reports
+the one-off template compile time, the time to render every category
+section, and the time to assemble them into one digest. A final fan-out run
+assembles one digest per distinct subscription set for many recipients.
+
+    python -m benchmarks.bench_email_render
+    python -m benchmarks.bench_email_render --sizes 10 1000 10000 100000 --repeat 3
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta, timezone
+
+from email_sender import CATEGORY_ORDER
+from email_templates import assemble_digest, get_template_environment, group_by_category, render_sections
+
+CATEGORIES = CATEGORY_ORDER + ['venture_capital', 'finance', 'energy', 'sports']
+
+
+def make_summaries(count, seed=0):
+    """Synthetic summaries with realistic lengths, spread over categories and a few days"""
+    rng = random.Random(seed)
+    start = datetime(2024, 3, 1, tzinfo=timezone.utc)
+    words = ('market', 'policy', 'launch', 'study', 'report', 'deal', 'growth', 'court', 'model', 'energy',
+             '<tag>', 'R&D', '"quoted"')
+    return [
+        {
+            'title': ' '.join(rng.choice(words) for _ in range(rng.randint(6, 12))).title(),
+            'link': f"https://example.com/{i}/{'-'.join(rng.choice(words) for _ in range(4))}?utm_source=rss&id={i}",
+            'published': start + timedelta(minutes=rng.randint(0, 3 * 24 * 60)),
+            'source': f"https://feeds.example.com/{rng.randint(1, 40)}.xml",
+            'summary': ' '.join(rng.choice(words) for _ in range(rng.randint(35, 60))) + '.',
+            'category': rng.choice(CATEGORIES)
+        }
+        for i in range(count)
+    ]
+
+
+def timed(repeat, function, *args, **kwargs):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = function(*args, **kwargs)
+    return (time.perf_counter() - start) / repeat, result
+
+
+def make_subscriptions(recipients, distinct_sets, seed=0):
+    """recipients addresses spread over distinct_sets random category subsets"""
+    rng = random.Random(seed)
+    sets = [frozenset(rng.sample(CATEGORIES, rng.randint(1, 5))) for _ in range(distinct_sets)]
+    return {f"reader{i}@example.com": rng.choice(sets) for i in range(recipients)}
+
+
+def run_benchmark(sizes, repeat, recipients, distinct_sets):
+    environment = get_template_environment()
+    start = time.perf_counter()
+    for name in ('digest.html', 'digest.txt', 'section.html', 'section.txt'):
+        environment.get_template(name)
+    print(f"Template compile (once per process): {(time.perf_counter() - start) * 1000:.1f} ms\n")
+
+    print(f"{'items':>8} {'group ms':>9} {'sections ms':>12} {'assemble ms':>12} {'items/s':>10} {'html KB':>9}")
+    for size in sizes:
+        summaries = make_summaries(size)
+        group_time, sections = timed(1, group_by_category, summaries, CATEGORY_ORDER)
+        render_time, rendered = timed(repeat, render_sections, sections)
+        assemble_time, (html, _) = timed(repeat, assemble_digest, rendered, '2024-03-04')
+        total = group_time + render_time + assemble_time
+        print(f"{size:>8} {group_time * 1000:>9.2f} {render_time * 1000:>12.2f} {assemble_time * 1000:>12.2f} "
+              f"{size / total:>10.0f} {len(html.encode('utf-8')) / 1024:>9.0f}")
+
+    # Fan-out: sections are rendered once, then one digest per distinct subscription set
+    size = sizes[-1]
+    subscriptions = make_subscriptions(recipients, distinct_sets)
+    rendered = render_sections(group_by_category(make_summaries(size), CATEGORY_ORDER))
+    start = time.perf_counter()
+    digests = {categories: assemble_digest(rendered, '2024-03-04', categories)
+               for categories in set(subscriptions.values())}
+    elapsed = time.perf_counter() - start
+    print(f"\nFan-out of {size} items to {recipients} recipients: {len(digests)} digests assembled "
+          f"in {elapsed * 1000:.1f} ms ({elapsed / len(digests) * 1000:.2f} ms per subscription set)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 1000, 10000], help='Digest sizes to render')
+    parser.add_argument('--repeat', type=int, default=5, help='Renders per size')
+    parser.add_argument('--recipients', type=int, default=10000, help='Recipients for the fan-out run')
+    parser.add_argument('--distinct-sets', type=int, default=20, help='Distinct subscription sets among them')
+    args = parser.parse_args()
+    run_benchmark(args.sizes, args.repeat, args.recipients, args.distinct_sets)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""Measure how article extraction scales with the number of worker processes.
+
+Extracts the same pages in-process and then with ExtractionPool at each
+worker count, both as one batch (ExtractionPool.map) and page by page from
+many threads (ExtractionPool.extract, as the pipeline's page stage calls
+it). Worker start-up is excluded. Uses the saved pages of bench_extractors
+when there are any, otherwise synthetic pages.
+
+    python -m benchmarks.bench_extraction_pool
+    python -m benchmarks.bench_extraction_pool --workers 1 2 4 8 --pages 400 --backend soup
+"""
+import argparse
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.bench_extractors import DEFAULT_CORPUS, load_corpus
+from config import AVAILABLE_CPUS, EXTRACTOR_BACKEND, FETCH_MAX_CONCURRENCY
+from extraction_pool import ExtractionPool
+
+
+def make_pages(count, paragraphs=120, seed=0):
+    """Synthetic article pages of roughly 60-100 KB with the usual page chrome around them"""
+    rng = random.Random(seed)
+    words = ['market', 'policy', 'launch', 'study', 'report', 'deal', 'growth', 'court', 'model', 'energy',
+             'city', 'vote', 'budget', 'climate', 'league', 'trial', 'startup', 'chip', 'rate', 'health']
+    pages = []
+    for _ in range(count):
+        body = ''.join(
+            f"<p class=\"para\">{' '.join(rng.choice(words) for _ in range(rng.randint(40, 80)))}. "
+            f"<a href=\"/related/{rng.randint(1, 999)}\">Read more</a></p>"
+            for _ in range(paragraphs)
+        )
+        pages.append(
+            "<html><head><title>Story</title><script>window.ads = [];</script><style>p{}</style></head><body>"
+            "<header><nav><ul>" + ''.join(f"<li><a href=\"/s{i}\">Section {i}</a></li>" for i in range(40)) +
+            "</ul></nav></header><main><article><h1>Headline</h1>" + body + "</article></main>"
+            "<aside>" + ''.join(f"<div class=\"promo\">Promo {i}</div>" for i in range(30)) + "</aside>"
+            "<footer>Copyright</footer></body></html>"
+        )
+    return pages
+
+
+def time_batch(pool, pages, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        pool.map(pages)
+    return (time.perf_counter() - start) / repeat
+
+
+def time_threaded(pool, pages, repeat, threads):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        for _ in range(repeat):
+            list(executor.map(pool.extract, pages))
+    return (time.perf_counter() - start) / repeat
+
+
+def run_benchmark(pages, worker_counts, backend, repeat, threads):
+    megabytes = sum(len(page.encode('utf-8')) for page in pages) / 1e6
+    print(f"{len(pages)} pages, {megabytes:.1f} MB, backend {backend}, {AVAILABLE_CPUS} CPUs available, "
+          f"{repeat} repeats\n")
+    print(f"{'workers':>8} {'batch pages/s':>14} {'speedup':>8} {'threaded pages/s':>17} {'speedup':>8}")
+
+    baseline = None
+    for workers in [0] + worker_counts:
+        # inline_bytes=0 so every page goes to a worker when there are workers
+        pool = ExtractionPool(workers=workers, backend=backend, inline_bytes=0)
+        try:
+            # Start every worker before timing
+            pool.start()
+            batch = time_batch(pool, pages, repeat)
+            threaded = time_threaded(pool, pages, repeat, threads)
+        finally:
+            pool.close()
+        baseline = baseline or (batch, threaded)
+        label = 'inline' if not pool.parallel else str(workers)
+        print(f"{label:>8} {len(pages) / batch:>14.1f} {baseline[0] / batch:>7.2f}x "
+              f"{len(pages) / threaded:>17.1f} {baseline[1] / threaded:>7.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    default_workers = sorted({2, 4, AVAILABLE_CPUS} - {0, 1})
+    parser.add_argument('--workers', type=int, nargs='+', default=default_workers, help='Worker counts to try')
+    parser.add_argument('--pages', type=int, default=200, help='Synthetic pages when there is no saved corpus')
+    parser.add_argument('--backend', default=EXTRACTOR_BACKEND, help='Extractor backend (lxml or soup)')
+    parser.add_argument('--repeat', type=int, default=3, help='Passes over the pages per measurement')
+    parser.add_argument('--threads', type=int, default=FETCH_MAX_CONCURRENCY,
+                        help='Calling threads for the threaded measurement')
+    args = parser.parse_args()
+
+    pages = [html for _, html in load_corpus(DEFAULT_CORPUS)] if DEFAULT_CORPUS.exists() else []
+    pages = pages or make_pages(args.pages)
+    run_benchmark(pages, args.workers, args.backend, args.repeat, args.threads)
+
+
+if __name__ == '__main__':
+    main()
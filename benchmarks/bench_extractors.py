@@ -0,0 +1,107 @@
+"""Compare article extractor backends over a corpus of saved HTML pages.
+
+Reports throughput for every backend and how closely its text matches the
+reference BeautifulSoup extractor.
+
+    python -m benchmarks.bench_extractors --collect 50   # save pages from config.json feeds
+    python -m benchmarks.bench_extractors                # run the benchmark
+"""
+import argparse
+import hashlib
+import time
+from difflib import SequenceMatcher
+from pathlib import Path
+
+from extractors import EXTRACTORS, SoupExtractor
+
+DEFAULT_CORPUS = Path(__file__).parent / 'corpus' / 'html'
+
+
+def collect_corpus(corpus_dir, limit):
+    """Download article pages linked from the configured feeds into corpus_dir"""
+    from feed_parser import FeedParser
+    from fetcher import Fetcher
+    from main import load_config
+
+    corpus_dir.mkdir(parents=True, exist_ok=True)
+    feed_urls = load_config()['feed_urls']
+    fetcher = Fetcher()
+
+    links = []
+    for feed_url, result in fetcher.fetch_all(feed_urls).items():
+        if result['status'] == 200:
+            links.extend(stub['link'] for stub in FeedParser(feed_url).parse_entries(result['text']))
+
+    saved = 0
+    for link, result in fetcher.fetch_all(links[:limit]).items():
+        if result['status'] == 200 and result['text']:
+            name = hashlib.sha1(link.encode('utf-8')).hexdigest()[:16] + '.html'
+            (corpus_dir / name).write_text(result['text'], encoding='utf-8')
+            saved += 1
+    print(f"Saved {saved} pages to {corpus_dir}")
+
+
+def load_corpus(corpus_dir):
+    return [(path.name, path.read_text(encoding='utf-8', errors='replace'))
+            for path in sorted(corpus_dir.glob('*.html'))]
+
+
+def similarity(reference, text):
+    if reference == text:
+        return 1.0
+    if not reference or not text:
+        return 0.0
+    return SequenceMatcher(None, reference.split(), text.split(), autojunk=False).ratio()
+
+
+def run_benchmark(pages, repeat):
+    total_bytes = sum(len(html.encode('utf-8')) for _, html in pages)
+    reference = [SoupExtractor().extract(html) for _, html in pages]
+
+    print(f"{len(pages)} pages, {total_bytes / 1e6:.1f} MB, {repeat} repeats\n")
+    print(f"{'backend':<8} {'pages/s':>10} {'MB/s':>8} {'speedup':>8} {'exact':>8} {'mean sim':>9} {'min sim':>8}")
+
+    baseline = None
+    for name, extractor_class in EXTRACTORS.items():
+        try:
+            extractor = extractor_class()
+        except ImportError as e:
+            print(f"{name:<8} skipped ({e})")
+            continue
+
+        start = time.perf_counter()
+        for _ in range(repeat):
+            texts = [extractor.extract(html) for _, html in pages]
+        elapsed = (time.perf_counter() - start) / repeat
+
+        scores = [similarity(ref or '', text or '') for ref, text in zip(reference, texts)]
+        exact = sum(ref == text for ref, text in zip(reference, texts))
+        baseline = baseline or (elapsed if name == SoupExtractor.name else None)
+        speedup = f"{baseline / elapsed:.1f}x" if baseline else '-'
+        print(f"{name:<8} {len(pages) / elapsed:>10.1f} {total_bytes / 1e6 / elapsed:>8.2f} {speedup:>8} "
+              f"{exact:>4}/{len(pages):<3} {sum(scores) / len(scores):>9.3f} {min(scores):>8.3f}")
+
+        worst = sorted(zip(scores, (page for page, _ in pages)))[:3]
+        for score, page in worst:
+            if score < 1.0:
+                print(f"    lowest parity: {page} ({score:.3f})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark article extractor backends')
+    parser.add_argument('--corpus', type=Path, default=DEFAULT_CORPUS, help='Directory of saved .html pages')
+    parser.add_argument('--repeat', type=int, default=3, help='Passes over the corpus per backend')
+    parser.add_argument('--collect', type=int, metavar='N', help='Save up to N article pages from config.json feeds first')
+    args = parser.parse_args()
+
+    if args.collect:
+        collect_corpus(args.corpus, args.collect)
+
+    pages = load_corpus(args.corpus) if args.corpus.exists() else []
+    if not pages:
+        parser.error(f"No .html pages in {args.corpus}; run with --collect N first")
+    run_benchmark(pages, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+"""End-to-end benchmark of a run over synthetic or recorded feeds, fully offline.
+
+Each workload is served by the harness stand-ins (benchmarks/harness.py):
+feeds and pages from a local HTTP server, summaries from a fake OpenAI
+endpoint and email to a local SMTP sink. Every run goes through fetch,
+extract, cluster, summarize, save and email in fresh storage, as a first
+run_daily would. Reports runs/sec, summaries/sec and median seconds per
+stage over --repeat runs, and the peak traced memory of one extra run under
+tracemalloc (kept separate because tracing slows the run down).
+
+    python -m benchmarks.bench_pipeline
+    python -m benchmarks.bench_pipeline --feeds 10 100 --repeat 5 --llm-latency 0.3
+    python -m benchmarks.bench_pipeline --corpus benchmarks/corpus/replay
+    python -m benchmarks.bench_pipeline --json results.json
+"""
+import argparse
+import json
+import logging
+import statistics
+import time
+import tracemalloc
+
+from benchmarks.harness import Corpus, SMTPSink, StandInServer, replay_adapter, routed_session, run_once
+from config import MAX_ARTICLES
+
+STAGES = ['feeds', 'pages', 'extract', 'clusters', 'summaries', 'sink', 'save_state', 'email']
+
+
+def make_email_sender(sink, recipients):
+    from email_sender import EmailSender
+
+    sender = EmailSender(config={'email_recipients': [f"reader{i}@example.com" for i in range(recipients)]})
+    sender.email_config.update({
+        'sender': 'digest@example.com',
+        'password': None,
+        'smtp_server': sink.host,
+        'smtp_port': sink.port,
+        'smtp_use_ssl': False
+    })
+    return sender
+
+
+def make_summarizer_factory(server, unthrottled):
+    from openai import OpenAI
+
+    from summarizer import RateLimiter, Summarizer
+
+    client = OpenAI(api_key='stand-in', base_url=f"{server.url}/v1", max_retries=0)
+
+    def make_summarizer():
+        summarizer = Summarizer(client=client)
+        if unthrottled:
+            # The configured rate limits would dominate larger workloads
+            summarizer.rate_limiter = RateLimiter(float('inf'), float('inf'))
+        return summarizer
+    return make_summarizer
+
+
+def run_workload(name, corpus, repeat, llm_latency, recipients, unthrottled):
+    feed_urls = corpus.feed_urls
+    with StandInServer(corpus, llm_latency=llm_latency) as server, SMTPSink() as sink, \
+            routed_session(replay_adapter(server.url)):
+        make_summarizer = make_summarizer_factory(server, unthrottled)
+        email_sender = make_email_sender(sink, recipients)
+
+        durations, stage_runs, summary_counts = [], [], []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            summaries, stage_times = run_once(feed_urls, make_summarizer, email_sender)
+            durations.append(time.perf_counter() - start)
+            stage_runs.append(stage_times)
+            summary_counts.append(len(summaries))
+
+        tracemalloc.start()
+        run_once(feed_urls, make_summarizer, email_sender)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    duration = statistics.median(durations)
+    return {
+        'workload': name,
+        'feeds': len(feed_urls),
+        'pages': corpus.page_count,
+        'summaries': statistics.median(summary_counts),
+        'runs_per_second': 1 / duration,
+        'summaries_per_second': statistics.median(summary_counts) / duration,
+        'run_seconds': duration,
+        'stage_seconds': {stage: statistics.median(run.get(stage, 0.0) for run in stage_runs) for stage in STAGES},
+        'peak_memory_mb': peak / 1024 / 1024,
+        'emails_per_run': sink.messages / (repeat + 1)
+    }
+
+
+def print_results(results):
+    header = f"{'workload':<14} {'feeds':>6} {'pages':>6} {'runs/s':>8} {'sum/s':>8}"
+    header += ''.join(f" {stage:>10}" for stage in STAGES) + f" {'peak MB':>8}"
+    print(header)
+    for result in results:
+        line = (f"{result['workload']:<14} {result['feeds']:>6} {result['pages']:>6} "
+                f"{result['runs_per_second']:>8.3f} {result['summaries_per_second']:>8.1f}")
+        line += ''.join(f" {result['stage_seconds'][stage]:>10.3f}" for stage in STAGES)
+        line += f" {result['peak_memory_mb']:>8.1f}"
+        print(line)
+    print("\nStage columns are median wall seconds per run; stages overlap, so they don't add up to the run time.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--feeds', type=int, nargs='+', default=[10, 100, 1000], help='Synthetic workload sizes')
+    parser.add_argument('--entries', type=int, default=MAX_ARTICLES, help='Entries per synthetic feed')
+    parser.add_argument('--duplicates', type=float, default=0.1, help='Share of near-duplicate synthetic stories')
+    parser.add_argument('--corpus', help='Replay a recorded corpus instead of the synthetic workloads')
+    parser.add_argument('--repeat', type=int, default=3, help='Timed runs per workload')
+    parser.add_argument('--llm-latency', type=float, default=0.0, help='Seconds the fake OpenAI endpoint waits per call')
+    parser.add_argument('--recipients', type=int, default=100, help='Digest recipients')
+    parser.add_argument('--rate-limited', action='store_true',
+                        help='Keep the configured OpenAI rate limits instead of lifting them')
+    parser.add_argument('--json', help='Also write the results to this file')
+    parser.add_argument('--verbose', action='store_true', help='Show the application log')
+    args = parser.parse_args()
+
+    if not args.verbose:
+        logging.disable(logging.INFO)
+
+    if args.corpus:
+        workloads = [(args.corpus.rstrip('/').split('/')[-1], lambda: Corpus.load(args.corpus))]
+    else:
+        workloads = [
+            (f"synthetic-{feeds}", lambda feeds=feeds: Corpus.synthetic(feeds, args.entries, args.duplicates))
+            for feeds in args.feeds
+        ]
+
+    results = []
+    for name, load in workloads:
+        results.append(run_workload(name, load(), args.repeat, args.llm_latency, args.recipients,
+                                    unthrottled=not args.rate_limited))
+    print_results(results)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
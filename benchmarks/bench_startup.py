@@ -0,0 +1,121 @@
+"""Measure server cold start: import time and time to the first health check.
+
+Every sample runs in a fresh interpreter with -X importtime, the same way a
+new Cloud Run instance starts. Reports the median import time of the server
+and of the run pipeline (main), the time until `GET /` is answered, and the
+modules that cost the most, then checks the medians against the budget in
+benchmarks/startup_budget.json.
+
+    python -m benchmarks.bench_startup
+    python -m benchmarks.bench_startup --repeat 10 --top 20
+    python -m benchmarks.bench_startup --update-budget   # after an intended change
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+BUDGET_FILE = Path(__file__).parent / 'startup_budget.json'
+# Headroom added to measured times by --update-budget, so noise doesn't fail the check
+BUDGET_HEADROOM = 1.25
+
+SCENARIOS = {
+    'import server': 'import server',
+    'import main': 'import main',
+    'health check': (
+        'import time; start = time.perf_counter(); import server; '
+        'assert server.app.test_client().get("/").status_code == 200; '
+        'print(f"elapsed_ms={(time.perf_counter() - start) * 1000:.3f}")'
+    )
+}
+
+
+def parse_importtime(stderr):
+    """{module: (self_us, cumulative_us, depth)} from -X importtime output"""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip())) // 2
+        modules[name.strip()] = (int(self_us), int(cumulative_us), depth)
+    return modules
+
+
+def sample(code):
+    """Run code in a fresh interpreter; returns (milliseconds, importtime modules)"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    modules = parse_importtime(result.stderr)
+    for line in result.stdout.splitlines():
+        if line.startswith('elapsed_ms='):
+            return float(line.split('=', 1)[1]), modules
+    # Top-level imports only; their cumulative times already include everything below them
+    return sum(cumulative for _, cumulative, depth in modules.values() if depth == 0) / 1000, modules
+
+
+def run_benchmark(repeat, top):
+    results = {}
+    slowest = None
+    for name, code in SCENARIOS.items():
+        samples = [sample(code) for _ in range(repeat)]
+        times = [elapsed for elapsed, _ in samples]
+        results[name] = statistics.median(times)
+        print(f"{name:<15} median {results[name]:>8.1f} ms  (min {min(times):.1f}, max {max(times):.1f}, n={repeat})")
+        if name == 'import server':
+            slowest = samples[-1][1]
+
+    print(f"\nSlowest modules imported by the server (cumulative ms):")
+    # Only first-level packages, so a slow dependency isn't listed once per submodule
+    packages = sorted(
+        ((cumulative, name) for name, (_, cumulative, depth) in slowest.items() if depth <= 1),
+        reverse=True
+    )
+    for cumulative, name in packages[:top]:
+        print(f"  {cumulative / 1000:>8.1f}  {name}")
+    return results
+
+
+def check_budget(results):
+    """Print each measurement against its budget; returns False if any is over"""
+    if not BUDGET_FILE.exists():
+        print(f"\nNo budget at {BUDGET_FILE}; create one with --update-budget")
+        return True
+    budget = json.loads(BUDGET_FILE.read_text())
+    within = True
+    print(f"\nBudget ({BUDGET_FILE.name}):")
+    for name, elapsed in results.items():
+        limit = budget.get(name)
+        if limit is None:
+            continue
+        over = elapsed > limit
+        within = within and not over
+        print(f"  {name:<15} {elapsed:>8.1f} / {limit:.0f} ms  {'OVER' if over else 'ok'}")
+    return within
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5, help='Fresh interpreters per scenario')
+    parser.add_argument('--top', type=int, default=15, help='Slowest modules to list')
+    parser.add_argument('--update-budget', action='store_true',
+                        help=f'Write the measured medians plus {BUDGET_HEADROOM - 1:.0%} headroom as the new budget')
+    args = parser.parse_args()
+
+    results = run_benchmark(args.repeat, args.top)
+    if args.update_budget:
+        BUDGET_FILE.write_text(json.dumps(
+            {name: round(elapsed * BUDGET_HEADROOM) for name, elapsed in results.items()}, indent=2
+        ) + '\n')
+        print(f"\nSaved budget to {BUDGET_FILE}")
+    elif not check_budget(results):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,451 @@
+"""Offline stand-ins for everything a run talks to, so runs can be measured reproducibly.
+
+- Corpus: feed XML, article HTML and LLM completions, either recorded from
+  the configured feeds or generated, saved as a fixture directory.
+- StandInServer: one local HTTP server that answers any URL from the corpus
+  (requests are routed to it by ReplayAdapter) and a fake OpenAI-compatible
+  /v1/chat/completions endpoint.
+- SMTPSink: a local SMTP server that accepts and counts messages.
+
+Record a corpus from the feeds in config.json (needs network access and
+OPENAI_API_KEY; no email is sent):
+
+    python -m benchmarks.harness record --corpus benchmarks/corpus/replay
+    python -m benchmarks.harness record --corpus benchmarks/corpus/replay --max-feeds 5
+
+Replay it with python -m benchmarks.bench_pipeline --corpus benchmarks/corpus/replay.
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import socketserver
+import tempfile
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, quote, urlsplit
+from xml.sax.saxutils import escape
+
+from requests.adapters import HTTPAdapter
+
+from config import HTTP_POOL_CONNECTIONS, HTTP_POOL_MAXSIZE, SUMMARY_PROMPT
+from email_sender import CATEGORY_ORDER
+from http_client import close_session, get_session
+
+# Response headers kept in a corpus; the rest vary between fetches
+KEPT_HEADERS = ('Content-Type', 'ETag', 'Last-Modified')
+
+
+def completion_key(prompt):
+    """Corpus key of an LLM completion: a hash of the user message it answered"""
+    return hashlib.sha256(prompt.encode('utf-8')).hexdigest()
+
+
+def synthetic_completion(prompt):
+    """A plausible summary JSON for prompts the corpus has no recording for"""
+    text = prompt[len(SUMMARY_PROMPT):].strip() if prompt.startswith(SUMMARY_PROMPT) else prompt
+    words = text.split()
+    return json.dumps({
+        'summary': ' '.join(words[:50]) + ('...' if len(words) > 50 else ''),
+        'category': CATEGORY_ORDER[zlib.crc32(text.encode('utf-8')) % len(CATEGORY_ORDER)]
+    })
+
+
+class Corpus:
+    """Recorded HTTP responses by URL and LLM completions by prompt hash.
+
+    Saved as index.json (response metadata), completions.json and one body
+    file per response under bodies/.
+    """
+
+    def __init__(self):
+        self.responses = {}
+        self.completions = {}
+        self.lock = threading.Lock()
+
+    def add_response(self, url, status, headers, body, kind):
+        headers = {name: headers[name] for name in KEPT_HEADERS if headers.get(name)}
+        with self.lock:
+            self.responses[url] = {'status': status, 'headers': headers, 'body': body, 'kind': kind}
+
+    def add_completion(self, prompt, content):
+        with self.lock:
+            self.completions[completion_key(prompt)] = content
+
+    @property
+    def feed_urls(self):
+        return [url for url, response in self.responses.items() if response['kind'] == 'feed']
+
+    @property
+    def page_count(self):
+        return sum(response['kind'] == 'page' for response in self.responses.values())
+
+    def save(self, directory):
+        directory = Path(directory)
+        (directory / 'bodies').mkdir(parents=True, exist_ok=True)
+        index = {}
+        for url, response in self.responses.items():
+            name = hashlib.sha1(url.encode('utf-8')).hexdigest()
+            (directory / 'bodies' / name).write_bytes(response['body'])
+            index[url] = {**response, 'body': name}
+        (directory / 'index.json').write_text(json.dumps(index, indent=2, sort_keys=True))
+        (directory / 'completions.json').write_text(json.dumps(self.completions, indent=2, sort_keys=True))
+
+    @classmethod
+    def load(cls, directory):
+        directory = Path(directory)
+        corpus = cls()
+        for url, response in json.loads((directory / 'index.json').read_text()).items():
+            corpus.responses[url] = {**response, 'body': (directory / 'bodies' / response['body']).read_bytes()}
+        completions_file = directory / 'completions.json'
+        if completions_file.exists():
+            corpus.completions = json.loads(completions_file.read_text())
+        return corpus
+
+    @classmethod
+    def synthetic(cls, feeds, entries_per_feed=5, duplicate_ratio=0.1, hosts=25, words_per_article=600, seed=0):
+        """Generated feeds spread over several hosts, with a share of near-duplicate stories"""
+        rng = random.Random(seed)
+        vocabulary = [''.join(rng.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(rng.randint(3, 9)))
+                      for _ in range(2000)]
+        corpus = cls()
+        stories = []
+        now = time.time()
+        for feed_index in range(feeds):
+            host = f"news{feed_index % hosts}.example.com"
+            feed_url = f"https://{host}/feeds/{feed_index}.xml"
+            items = []
+            for entry_index in range(entries_per_feed):
+                link = f"https://{host}/{feed_index}/story-{entry_index}.html"
+                if stories and rng.random() < duplicate_ratio:
+                    # Same story as another feed's, lightly reworded
+                    words = list(rng.choice(stories))
+                    for _ in range(len(words) // 50):
+                        words[rng.randrange(len(words))] = rng.choice(vocabulary)
+                else:
+                    words = [rng.choice(vocabulary) for _ in range(words_per_article)]
+                    stories.append(words)
+                title = ' '.join(words[:8]).title()
+                paragraphs = ''.join(f"<p>{' '.join(words[i:i + 60])}.</p>" for i in range(0, len(words), 60))
+                page = (f"<html><head><title>{title}</title><script>var x = 1;</script></head><body>"
+                        f"<nav>Home | World | Tech</nav><article><h1>{title}</h1>{paragraphs}</article>"
+                        f"<footer>Copyright {host}</footer></body></html>")
+                corpus.add_response(link, 200, {'Content-Type': 'text/html; charset=utf-8'},
+                                    page.encode('utf-8'), 'page')
+                published = formatdate(now - (feed_index * 7 + entry_index) * 3600, usegmt=True)
+                items.append(f"<item><title>{escape(title)}</title><link>{link}</link>"
+                             f"<pubDate>{published}</pubDate>"
+                             f"<description>{' '.join(words[:40])}</description></item>")
+            feed = (f'<?xml version="1.0" encoding="UTF-8"?><rss version="2.0"><channel>'
+                    f'<title>Feed {feed_index}</title><link>https://{host}/</link>{"".join(items)}</channel></rss>')
+            corpus.add_response(feed_url, 200, {
+                'Content-Type': 'application/rss+xml; charset=utf-8',
+                'ETag': f'"feed-{feed_index}"',
+                'Last-Modified': formatdate(now, usegmt=True)
+            }, feed.encode('utf-8'), 'feed')
+        return corpus
+
+
+class _StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive, like the real hosts
+    corpus = None
+    llm_latency = 0.0
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, headers, body):
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = parse_qs(urlsplit(self.path).query).get('url', [''])[0]
+        response = self.corpus.responses.get(url)
+        if response is None:
+            return self._send(404, {}, b'')
+        headers = response['headers']
+        if ((headers.get('ETag') and self.headers.get('If-None-Match') == headers['ETag']) or
+                (headers.get('Last-Modified') and self.headers.get('If-Modified-Since') == headers['Last-Modified'])):
+            return self._send(304, {name: value for name, value in headers.items() if name != 'Content-Type'}, b'')
+        self._send(response['status'], headers, response['body'])
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+        if not self.path.endswith('/chat/completions'):
+            return self._send(404, {}, b'')
+        prompt = request['messages'][-1]['content']
+        content = self.corpus.completions.get(completion_key(prompt)) or synthetic_completion(prompt)
+        if self.llm_latency:
+            time.sleep(self.llm_latency)
+        body = json.dumps({
+            'id': 'chatcmpl-stand-in',
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': request.get('model', 'stand-in'),
+            'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': content}, 'finish_reason': 'stop'}],
+            'usage': {
+                'prompt_tokens': len(prompt) // 4,
+                'completion_tokens': len(content) // 4,
+                'total_tokens': (len(prompt) + len(content)) // 4
+            }
+        }).encode('utf-8')
+        self._send(200, {'Content-Type': 'application/json'}, body)
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    # Every pipeline worker may connect at once
+    request_queue_size = 256
+
+
+class StandInServer:
+    """Serves a corpus for any URL routed to it and fakes the OpenAI chat completions API.
+
+    Pages and feeds honour If-None-Match / If-Modified-Since like a well
+    behaved host. Completions are looked up by prompt, falling back to a
+    synthetic summary, after llm_latency seconds.
+    """
+
+    def __init__(self, corpus, llm_latency=0.0):
+        handler = type('Handler', (_StandInHandler,), {'corpus': corpus, 'llm_latency': llm_latency})
+        self.httpd = _Server(('127.0.0.1', 0), handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name='stand-in-http', daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    def _reply(self, line):
+        self.wfile.write(line.encode('ascii') + b'\r\n')
+
+    def handle(self):
+        self._reply('220 stand-in ESMTP')
+        recipients = []
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                break
+            verb = line[:4].decode('ascii', errors='replace').upper()
+            if verb in ('HELO', 'EHLO'):
+                self._reply('250 stand-in')
+            elif verb in ('MAIL', 'RSET'):
+                recipients = []
+                self._reply('250 OK')
+            elif verb == 'RCPT':
+                recipients.append(line[8:].strip().decode('ascii', errors='replace'))
+                self._reply('250 OK')
+            elif verb == 'DATA':
+                self._reply('354 End data with <CR><LF>.<CR><LF>')
+                size = 0
+                for data in iter(self.rfile.readline, b''):
+                    if data == b'.\r\n':
+                        break
+                    size += len(data)
+                self.server.sink.record(recipients, size)
+                self._reply('250 OK')
+            elif verb == 'NOOP':
+                self._reply('250 OK')
+            elif verb == 'QUIT':
+                self._reply('221 Bye')
+                break
+            else:
+                self._reply('502 Command not implemented')
+
+
+class _SMTPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class SMTPSink:
+    """Local plain SMTP server that accepts every message and only counts them"""
+
+    def __init__(self):
+        self.server = _SMTPServer(('127.0.0.1', 0), _SMTPHandler)
+        self.server.sink = self
+        self.host, self.port = self.server.server_address
+        self.lock = threading.Lock()
+        self.messages = 0
+        self.recipients = 0
+        self.bytes = 0
+
+    def record(self, recipients, size):
+        with self.lock:
+            self.messages += 1
+            self.recipients += len(recipients)
+            self.bytes += size
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, name='smtp-sink', daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+
+class ReplayAdapter(HTTPAdapter):
+    """Sends every request to a StandInServer instead of the host in its URL"""
+
+    def __init__(self, base_url, **kwargs):
+        super().__init__(**kwargs)
+        self.base_url = base_url
+
+    def send(self, request, **kwargs):
+        original = request.url
+        request.url = f"{self.base_url}/replay?url={quote(original, safe='')}"
+        response = super().send(request, **kwargs)
+        response.url = original
+        return response
+
+
+class RecordingAdapter(HTTPAdapter):
+    """Fetches from the real hosts and adds every response to a corpus"""
+
+    def __init__(self, corpus, feed_urls, **kwargs):
+        super().__init__(**kwargs)
+        self.corpus = corpus
+        self.feed_urls = set(feed_urls)
+
+    def send(self, request, **kwargs):
+        response = super().send(request, **kwargs)
+        kind = 'feed' if request.url in self.feed_urls else 'page'
+        self.corpus.add_response(request.url, response.status_code, response.headers, response.content, kind)
+        return response
+
+
+@contextmanager
+def routed_session(adapter):
+    """Route the shared HTTP session through adapter; the session is rebuilt afterwards"""
+    session = get_session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    try:
+        yield session
+    finally:
+        close_session()
+
+
+def replay_adapter(base_url):
+    return ReplayAdapter(base_url, pool_connections=HTTP_POOL_CONNECTIONS, pool_maxsize=HTTP_POOL_MAXSIZE)
+
+
+@contextmanager
+def temporary_storage():
+    """Point STORAGE_PATH at a fresh directory, so caches start empty and nothing real is touched"""
+    previous = os.environ.get('STORAGE_PATH')
+    with tempfile.TemporaryDirectory(prefix='rss-bench-') as storage:
+        os.environ['STORAGE_PATH'] = storage
+        try:
+            yield storage
+        finally:
+            if previous is None:
+                os.environ.pop('STORAGE_PATH', None)
+            else:
+                os.environ['STORAGE_PATH'] = previous
+
+
+def run_once(feed_urls, make_summarizer, email_sender=None):
+    """One run_daily over feed_urls in throwaway storage; returns (summaries, stage seconds).
+
+    Same steps as main.process_feed_urls plus the email, but without the run
+    journal and with the summarizer (and so the LLM client) supplied by the
+    caller.
+    """
+    from article_cache import ArticleCache
+    from feed_cache import FeedCache
+    from fetcher import Fetcher
+    from pipeline import Pipeline, SummarySink
+
+    with temporary_storage() as storage:
+        summarizer = make_summarizer()
+        cache = ArticleCache()
+        feed_cache = FeedCache()
+        sink = SummarySink(os.path.join(storage, 'summaries.jsonl'))
+        try:
+            summaries, stage_times = Pipeline(feed_urls, Fetcher(), summarizer, cache, feed_cache, sink).run()
+        finally:
+            sink.close()
+
+        started = time.perf_counter()
+        cache.flush()
+        feed_cache.save()
+        summarizer.save_cache()
+        stage_times['save_state'] = time.perf_counter() - started
+
+        if email_sender is not None and summaries:
+            started = time.perf_counter()
+            email_sender.send_summaries(summaries)
+            stage_times['email'] = time.perf_counter() - started
+        cache.close()
+    return summaries, stage_times
+
+
+def record(corpus_dir, feed_urls):
+    """Run the pipeline once against the live feeds and OpenAI, saving everything it received"""
+    from summarizer import Summarizer
+
+    corpus = Corpus()
+
+    class RecordingSummarizer(Summarizer):
+        def _create_completion(self, text):
+            response = super()._create_completion(text)
+            corpus.add_completion(f"{SUMMARY_PROMPT}\n\n{text}", response.choices[0].message.content)
+            return response
+
+    adapter = RecordingAdapter(corpus, feed_urls, pool_connections=HTTP_POOL_CONNECTIONS,
+                               pool_maxsize=HTTP_POOL_MAXSIZE,
+                               max_retries=get_session().get_adapter('https://').max_retries)
+    with routed_session(adapter):
+        summaries, _ = run_once(feed_urls, RecordingSummarizer)
+    corpus.save(corpus_dir)
+    print(f"Recorded {len(corpus.feed_urls)} feeds, {corpus.page_count} pages and "
+          f"{len(corpus.completions)} completions ({len(summaries)} summaries) to {corpus_dir}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    subcommands = parser.add_subparsers(dest='command', required=True)
+    record_parser = subcommands.add_parser('record', help='Record a corpus from the feeds in config.json')
+    record_parser.add_argument('--corpus', type=Path, required=True, help='Directory to save the corpus to')
+    record_parser.add_argument('--max-feeds', type=int, help='Only record the first N configured feeds')
+    args = parser.parse_args()
+
+    if args.command == 'record':
+        from main import load_config
+        feed_urls = load_config()['feed_urls'][:args.max_feeds]
+        record(args.corpus, feed_urls)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+import random
+import re
+import zlib
+
+from config import (
+    CLUSTER_SIMILARITY_THRESHOLD,
+    CLUSTER_SHINGLE_SIZE,
+    CLUSTER_MIN_SHINGLES,
+    CLUSTER_LSH_BANDS,
+    CLUSTER_LSH_ROWS
+)
+
+WORD = re.compile(r"\w+")
+
+# Shingle hashes are mixed with (a * x + b) mod a Mersenne prime; fixed seed so signatures are reproducible
+MERSENNE_PRIME = (1 << 61) - 1
+
+
+def shingles(text, size=CLUSTER_SHINGLE_SIZE):
+    """Set of hashed word n-grams of a text, ignoring case and punctuation"""
+    words = WORD.findall((text or '').lower())
+    return {
+        zlib.crc32(' '.join(words[i:i + size]).encode('utf-8'))
+        for i in range(max(0, len(words) - size + 1))
+    }
+
+
+class MinHasher:
+    """MinHash signatures whose agreement rate estimates Jaccard similarity of shingle sets.
+
+    Uses one-permutation hashing: every shingle is hashed once and kept as
+    the minimum of one of the signature's bins, so a signature costs O(n)
+    rather than O(n * length). Empty bins (short texts) borrow the next
+    non-empty bin's value, offset by the distance, so that two signatures
+    still agree on a bin only when their sets do.
+    """
+
+    def __init__(self, length=CLUSTER_LSH_BANDS * CLUSTER_LSH_ROWS, seed=1):
+        rng = random.Random(seed)
+        self.length = length
+        self.a = rng.randrange(1, MERSENNE_PRIME)
+        self.b = rng.randrange(0, MERSENNE_PRIME)
+
+    def signature(self, shingle_set):
+        length = self.length
+        bins = [None] * length
+        for value in shingle_set:
+            mixed = (self.a * value + self.b) % MERSENNE_PRIME
+            index, rank = mixed % length, mixed // length
+            if bins[index] is None or rank < bins[index]:
+                bins[index] = rank
+        if all(rank is None for rank in bins):
+            return tuple(bins)
+
+        signature = list(bins)
+        for index in range(length):
+            distance = 1
+            while signature[index] is None:
+                borrowed = bins[(index + distance) % length]
+                if borrowed is not None:
+                    signature[index] = borrowed + distance * MERSENNE_PRIME
+                distance += 1
+        return tuple(signature)
+
+    @staticmethod
+    def similarity(first, second):
+        return sum(x == y for x, y in zip(first, second)) / len(first)
+
+
+class MinHashLSH:
+    """Banded locality-sensitive index over MinHash signatures.
+
+    Each signature is cut into bands, and signatures sharing any whole band
+    land in the same bucket. Only bucket mates are compared, so finding the
+    near duplicates of an article costs about one lookup per band instead of
+    a comparison with every article seen so far.
+    """
+
+    def __init__(self, bands=CLUSTER_LSH_BANDS, rows=CLUSTER_LSH_ROWS):
+        self.bands = bands
+        self.rows = rows
+        self.buckets = [{} for _ in range(bands)]
+        self.signatures = {}
+
+    def _band_keys(self, signature):
+        return [signature[i * self.rows:(i + 1) * self.rows] for i in range(self.bands)]
+
+    def add(self, key, signature):
+        self.signatures[key] = signature
+        for bucket, band in zip(self.buckets, self._band_keys(signature)):
+            bucket.setdefault(band, []).append(key)
+
+    def query(self, signature):
+        """Keys of indexed signatures that share at least one band with this one"""
+        candidates = {}
+        for bucket, band in zip(self.buckets, self._band_keys(signature)):
+            for key in bucket.get(band, ()):
+                candidates[key] = None
+        return list(candidates)
+
+
+class StoryClusterer:
+    """Assigns articles to near-duplicate story clusters as they arrive.
+
+    The first article of a story becomes its representative; later articles
+    whose estimated similarity to it reaches the threshold join its cluster.
+    Not thread-safe; the pipeline runs it on a single worker.
+    """
+
+    def __init__(self, threshold=CLUSTER_SIMILARITY_THRESHOLD, min_shingles=CLUSTER_MIN_SHINGLES):
+        self.threshold = threshold
+        self.min_shingles = min_shingles
+        self.hasher = MinHasher()
+        self.index = MinHashLSH()
+        self.clusters = {}
+
+    def assign(self, key, text):
+        """Return the representative key this article duplicates, or None if it starts a new story"""
+        shingle_set = shingles(text)
+        if len(shingle_set) < self.min_shingles:
+            return None
+
+        signature = self.hasher.signature(shingle_set)
+        best, best_score = None, self.threshold
+        for candidate in self.index.query(signature):
+            score = MinHasher.similarity(signature, self.index.signatures[candidate])
+            if score >= best_score:
+                best, best_score = candidate, score
+
+        if best is not None:
+            self.clusters[best].append(key)
+            return best
+
+        # Only representatives are indexed, so every cluster has one entry point
+        self.index.add(key, signature)
+        self.clusters[key] = [key]
+        return None
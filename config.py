@@ -1,3 +1,4 @@
+import hashlib
 import os
 from dotenv import load_dotenv
 
@@ -5,11 +6,114 @@ load_dotenv()
 
 # OpenAI Configuration
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
+# Optional OpenAI-compatible endpoint, e.g. a local fake server for testing
+OPENAI_BASE_URL = os.getenv('OPENAI_BASE_URL') or None
+SUMMARY_MODEL = "gpt-4o-mini"
+SUMMARY_MAX_TOKENS = 250
+# Article text beyond this many input tokens is trimmed before it is sent
+SUMMARY_INPUT_TOKEN_BUDGET = int(os.getenv('SUMMARY_INPUT_TOKEN_BUDGET', '1500'))
+# Concurrency and rate limits for batched summarization
+SUMMARY_MAX_IN_FLIGHT = int(os.getenv('SUMMARY_MAX_IN_FLIGHT', '8'))
+SUMMARY_REQUESTS_PER_MINUTE = int(os.getenv('SUMMARY_REQUESTS_PER_MINUTE', '500'))
+SUMMARY_TOKENS_PER_MINUTE = int(os.getenv('SUMMARY_TOKENS_PER_MINUTE', '200000'))
+# Retries for 429 / 5xx / connection errors from the OpenAI API
+SUMMARY_MAX_RETRIES = int(os.getenv('SUMMARY_MAX_RETRIES', '5'))
+SUMMARY_BACKOFF_BASE = 1.0  # seconds
+SUMMARY_BACKOFF_MAX = 60  # seconds
+# Runs that may try to summarize an article before it is given up on, and
+# the wait before the first retry (doubled after every further failure)
+SUMMARY_MAX_ATTEMPTS = int(os.getenv('SUMMARY_MAX_ATTEMPTS', '4'))
+SUMMARY_RETRY_DELAY = int(os.getenv('SUMMARY_RETRY_DELAY', '900'))  # seconds
+
+# Cache Configuration
+# Processed articles are committed in batches of this many, or after this many seconds
+CACHE_FLUSH_EVERY = int(os.getenv('CACHE_FLUSH_EVERY', '25'))
+CACHE_FLUSH_INTERVAL = int(os.getenv('CACHE_FLUSH_INTERVAL', '30'))
 
 # Feed Configuration
 MAX_ARTICLES = 3
 TIME_WINDOW = 86400  # 24 hours in seconds
 
+# Feed Scheduling Configuration
+# Each feed is polled on its own interval, learned from how often it posts
+# and how often it comes back unchanged, kept within these bounds (seconds)
+FEED_MIN_INTERVAL = int(os.getenv('FEED_MIN_INTERVAL', '900'))
+FEED_MAX_INTERVAL = int(os.getenv('FEED_MAX_INTERVAL', '86400'))
+# Interval for feeds whose posting rate is not known yet
+FEED_DEFAULT_INTERVAL = int(os.getenv('FEED_DEFAULT_INTERVAL', '3600'))
+# Aim for about this fraction of MAX_ARTICLES new entries per poll, so
+# bursts don't push entries past the MAX_ARTICLES cut-off between polls
+FEED_POLL_HEADROOM = 0.5
+# Interval growth after each 304 / unchanged response
+FEED_BACKOFF_FACTOR = 1.5
+# Local times at which the accumulated summaries are emailed
+DIGEST_TIMES = [t.strip() for t in os.getenv('DIGEST_TIMES', '09:00,17:00').split(',') if t.strip()]
+
+# Fetch Configuration
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+FETCH_TIMEOUT = 10  # seconds
+# Maximum number of downloads in flight across all hosts
+FETCH_MAX_CONCURRENCY = int(os.getenv('FETCH_MAX_CONCURRENCY', '32'))
+# Maximum number of downloads in flight against a single host
+FETCH_PER_HOST_CONCURRENCY = int(os.getenv('FETCH_PER_HOST_CONCURRENCY', '4'))
+# Downloads are streamed and stop after this many bytes of body; a response
+# whose Content-Length is already larger is rejected without reading it
+FETCH_MAX_BYTES = {
+    'feed': int(os.getenv('FETCH_MAX_FEED_BYTES', str(8 * 1024 * 1024))),
+    'page': int(os.getenv('FETCH_MAX_PAGE_BYTES', str(2 * 1024 * 1024)))
+}
+# Media types accepted per download kind, matched as substrings of the
+# Content-Type; anything else (PDFs, images, video) is rejected before the
+# body is read. Responses without a Content-Type are accepted.
+FETCH_CONTENT_TYPES = {
+    'feed': ('xml', 'rss', 'atom', 'json', 'text/'),
+    'page': ('html',)
+}
+FETCH_CHUNK_BYTES = 64 * 1024
+
+# HTTP Connection Pool Configuration
+# Number of per-host connection pools kept alive by the shared session
+HTTP_POOL_CONNECTIONS = int(os.getenv('HTTP_POOL_CONNECTIONS', '100'))
+# Maximum open connections kept per host (should be >= FETCH_PER_HOST_CONCURRENCY)
+HTTP_POOL_MAXSIZE = int(os.getenv('HTTP_POOL_MAXSIZE', '8'))
+# Retries for connection errors and 429/5xx responses
+HTTP_MAX_RETRIES = int(os.getenv('HTTP_MAX_RETRIES', '3'))
+HTTP_BACKOFF_FACTOR = float(os.getenv('HTTP_BACKOFF_FACTOR', '0.5'))
+HTTP_BACKOFF_MAX = 30  # seconds
+HTTP_RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# Pipeline Configuration
+# Capacity of each queue between pipeline stages; a full queue makes the
+# stage feeding it wait, so only this many items sit between two stages
+PIPELINE_QUEUE_SIZE = int(os.getenv('PIPELINE_QUEUE_SIZE', '64'))
+
+# Clustering Configuration
+# Articles whose estimated shingle Jaccard similarity reaches this are
+# treated as the same story and only summarized once
+CLUSTER_SIMILARITY_THRESHOLD = float(os.getenv('CLUSTER_SIMILARITY_THRESHOLD', '0.5'))
+CLUSTER_SHINGLE_SIZE = 3  # words per shingle
+CLUSTER_MIN_SHINGLES = 20  # shorter texts are never clustered
+# MinHash signature length = LSH bands x rows per band
+CLUSTER_LSH_BANDS = 16
+CLUSTER_LSH_ROWS = 4
+
+# Extraction Configuration
+# 'lxml' (fast, default) or 'soup' (BeautifulSoup html.parser, always available)
+EXTRACTOR_BACKEND = os.getenv('EXTRACTOR_BACKEND', 'lxml')
+
+# CPUs this process may run on, which can be fewer than the machine has
+AVAILABLE_CPUS = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else (os.cpu_count() or 1)
+# Worker processes that parse article pages in parallel; 0 or 1 parses on
+# the calling thread
+EXTRACTION_WORKERS = int(os.getenv('EXTRACTION_WORKERS', str(AVAILABLE_CPUS)))
+# Pages smaller than this are parsed in-process, where it is cheaper than
+# sending them to a worker
+EXTRACTION_INLINE_BYTES = int(os.getenv('EXTRACTION_INLINE_BYTES', '16384'))
+# Batches with fewer pages than this are parsed in-process
+EXTRACTION_MIN_BATCH = 4
+# Most downloaded pages the pipeline hands to the worker pool in one batch
+EXTRACTION_BATCH_SIZE = int(os.getenv('EXTRACTION_BATCH_SIZE', '32'))
+
 # Summarization Configuration
 SYSTEM_PROMPT = """You are a professional content analyzer and summarizer. 
 You analyze articles and categorize them while creating concise summaries.
@@ -25,10 +129,39 @@ Return your response in this JSON format:
     "category": "one_of_the_predefined_categories"
 }"""
 
+# Changes whenever either prompt is edited, so cached summaries from older prompts are not reused
+PROMPT_VERSION = hashlib.sha256(f"{SYSTEM_PROMPT}\0{SUMMARY_PROMPT}".encode('utf-8')).hexdigest()[:12]
+
+# Maximum number of summaries kept in the content-hash summary cache
+SUMMARY_CACHE_MAX_ENTRIES = int(os.getenv('SUMMARY_CACHE_MAX_ENTRIES', '5000'))
+
 # Email Configuration
 EMAIL_SENDER = os.getenv('EMAIL_SENDER')
 EMAIL_PASSWORD = os.getenv('EMAIL_PASSWORD')
 # Can be comma-separated string in .env file
 EMAIL_RECIPIENTS = os.getenv('EMAIL_RECIPIENTS', '').split(',')
-SMTP_SERVER = "smtp.gmail.com"
-SMTP_PORT = 465
\ No newline at end of file
+SMTP_SERVER = os.getenv('SMTP_SERVER', 'smtp.gmail.com')
+SMTP_PORT = int(os.getenv('SMTP_PORT', '465'))
+# Set to false to use plain SMTP, e.g. against a local debugging server:
+# python -m aiosmtpd -n -l localhost:1025
+SMTP_USE_SSL = os.getenv('SMTP_USE_SSL', 'true').lower() not in ('0', 'false', 'no')
+# Recipients per message; providers reject messages with too many recipients
+SMTP_BATCH_SIZE = int(os.getenv('SMTP_BATCH_SIZE', '50'))
+# Authenticated connections kept open, and so batches sent at once
+SMTP_MAX_CONNECTIONS = int(os.getenv('SMTP_MAX_CONNECTIONS', '4'))
+# Retries for transient (4xx) SMTP failures and dropped connections
+SMTP_MAX_RETRIES = int(os.getenv('SMTP_MAX_RETRIES', '3'))
+SMTP_BACKOFF_BASE = 2.0  # seconds
+SMTP_TIMEOUT = 30  # seconds
+# Server Configuration
+# Load the run dependencies in the background as soon as the server starts,
+# instead of on the first /run
+WARMUP_ON_START = os.getenv('WARMUP_ON_START', 'false').lower() in ('1', 'true', 'yes')
+
+# Logging Configuration
+# 'text' for the human-readable format, 'json' for one JSON object per line
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'text').lower()
+# Per-article messages logged more than this many times per window are
+# dropped, and the number dropped is reported with the next one let through
+LOG_SAMPLE_BURST = int(os.getenv('LOG_SAMPLE_BURST', '10'))
+LOG_SAMPLE_WINDOW = 60  # seconds
@@ -1,29 +1,45 @@
-import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from config import (
     EMAIL_SENDER, 
     EMAIL_PASSWORD, 
     SMTP_SERVER, 
-    SMTP_PORT
+    SMTP_PORT,
+    SMTP_USE_SSL
 )
+from email_templates import assemble_digest, group_by_category, render_sections
 from logger import setup_logger
+from smtp_delivery import SMTPConnectionPool, SMTPDelivery
+from metrics import EMAIL_SECONDS, EMAIL_SENT
 import json
+import time
 from datetime import datetime
 
 logger = setup_logger(__name__)
 
+# Order of the category sections in the digest
+CATEGORY_ORDER = [
+    'us_news',
+    'world_news',
+    'tech_news',
+    'business',
+    'crypto/blockchain',
+    'science',
+    'health',
+    'other'
+]
+
 class EmailSender:
-    def __init__(self):
+    def __init__(self, config=None):
+        """config is the parsed config.json; it is loaded from disk when not given"""
         self.logger = setup_logger(__name__)
         
         # Try different config paths
         config_paths = [
             '/app/config/config.json',  # Cloud Run mounted volume
             'config.json'               # Local development
-        ]
+        ] if config is None else []
         
-        config = None
         for path in config_paths:
             try:
                 with open(path, 'r') as f:
@@ -42,149 +58,119 @@ class EmailSender:
             'password': EMAIL_PASSWORD,
             'recipients': config.get('email_recipients', []),
             'smtp_server': SMTP_SERVER,
-            'smtp_port': SMTP_PORT
+            'smtp_port': SMTP_PORT,
+            'smtp_use_ssl': SMTP_USE_SSL
+        }
+        # Optional {recipient: [categories]}; recipients not listed get every category
+        self.subscriptions = {
+            recipient: frozenset(categories)
+            for recipient, categories in config.get('subscriptions', {}).items()
         }
         
         # Add category order
-        self.category_order = [
-            'us_news',
-            'world_news',
-            'tech_news',
-            'business',
-            'crypto/blockchain',
-            'science',
-            'health',
-            'other'
-        ]
+        self.category_order = list(CATEGORY_ORDER)
         self.logger.info(f"Initialized EmailSender with {len(self.email_config['recipients'])} recipients")
 
-    def format_summaries_to_html(self, summaries):
-        logger.debug("Formatting summaries to HTML")
-        
-        # Group summaries by category
-        categorized_summaries = {}
-        for summary in summaries:
-            category = summary.get('category', 'uncategorized')
-            if category not in categorized_summaries:
-                categorized_summaries[category] = []
-            categorized_summaries[category].append(summary)
-
-        # Get unknown categories and add them to the order list
-        unknown_categories = set(categorized_summaries.keys()) - set(self.category_order)
+    def group_by_category(self, summaries):
+        """Group summaries into sections in category_order, unknown categories last"""
+        sections = group_by_category(summaries, self.category_order)
+        unknown_categories = [section['category'] for section in sections
+                              if section['category'] not in self.category_order]
         if unknown_categories:
             self.logger.warning(f"Found unknown categories: {', '.join(unknown_categories)}")
-            categories_to_display = self.category_order + list(unknown_categories)
-        else:
-            categories_to_display = self.category_order
-
-        html = """
-        <html>
-        <head>
-            <style>
-                body { font-family: Arial, sans-serif; line-height: 1.6; max-width: 800px; margin: 0 auto; padding: 20px; }
-                .category { margin-bottom: 40px; }
-                .category-title { 
-                    color: #1a73e8; 
-                    text-transform: uppercase; 
-                    padding-bottom: 10px;
-                    border-bottom: 2px solid #1a73e8;
-                    margin-bottom: 20px;
-                }
-                .article { 
-                    margin-bottom: 30px; 
-                    border-bottom: 1px solid #eee; 
-                    padding-bottom: 20px; 
-                }
-                .title { 
-                    color: #2c3e50; 
-                    text-decoration: none;
-                    font-size: 1.2em;
-                }
-                .title:hover { text-decoration: underline; }
-                .meta { 
-                    color: #7f8c8d; 
-                    font-size: 0.9em;
-                    margin: 8px 0;
-                }
-                .summary { 
-                    color: #34495e;
-                    margin-top: 10px;
-                }
-            </style>
-        </head>
-        <body>
-        """
+        return sections
 
-        # Add summaries by category in specified order
-        for category in categories_to_display:
-            if category in categorized_summaries:
-                category_summaries = categorized_summaries[category]
-                category_display = category.replace('_', ' ').title()
-                html += f"""
-                <div class="category" id="{category}">
-                    <h2 class="category-title">{category_display} ({len(category_summaries)})</h2>
-                """
-                
-                for summary in category_summaries:
-                    # Format the date to show only Month Day, Year
-                    try:
-                        if isinstance(summary['published'], str):
-                            published_date = datetime.fromisoformat(summary['published'])
-                        else:
-                            published_date = summary['published']
-                        formatted_date = published_date.strftime('%B %d, %Y')  # e.g., "March 1, 2024"
-                    except Exception as e:
-                        self.logger.warning(f"Error formatting date: {e}")
-                        formatted_date = "Date unavailable"  # fallback if date parsing fails
-                    
-                    html += f"""
-                    <div class="article">
-                        <h3><a href="{summary['link']}" class="title">{summary['title']}</a></h3>
-                        <p class="meta">
-                            <strong>Published:</strong> {formatted_date}
-                        </p>
-                        <p class="summary">{summary['summary']}</p>
-                    </div>
-                    """
-                
-                html += "</div>"
-        
-        html += "</body></html>"
+    def format_summaries_to_html(self, summaries, sections=None):
+        logger.debug("Formatting summaries to HTML")
+        rendered = render_sections(sections or self.group_by_category(summaries))
+        html, _ = assemble_digest(rendered, self.digest_date())
         logger.debug("HTML formatting completed")
         return html
 
+    def format_summaries_to_text(self, summaries, sections=None):
+        """Plain-text alternative of the HTML digest"""
+        rendered = render_sections(sections or self.group_by_category(summaries))
+        _, text = assemble_digest(rendered, self.digest_date())
+        return text
+
+    @staticmethod
+    def digest_date():
+        return datetime.now().strftime('%Y-%m-%d')
+
+    def recipient_groups(self, categories):
+        """Group the sender and recipients by the set of available categories they get.
+
+        Recipients without a subscription get every category. Recipients whose
+        subscribed categories have no articles this time get nothing.
+        """
+        available = frozenset(categories)
+        groups = {}
+        for recipient in dict.fromkeys([self.email_config['sender']] + self.email_config['recipients']):
+            if not recipient:
+                continue
+            subscribed = self.subscriptions.get(recipient)
+            wanted = available if subscribed is None else available & subscribed
+            if not wanted:
+                self.logger.info(f"No articles in subscribed categories for {recipient}")
+                continue
+            groups.setdefault(wanted, []).append(recipient)
+        return groups
+
+    def build_message(self, html, text):
+        msg = MIMEMultipart('alternative')
+        msg['Subject'] = f"Daily News Brief - {self.digest_date()}"
+        msg['From'] = self.email_config['sender']
+        msg['To'] = self.email_config['sender']
+        # Plain text first: clients show the last alternative they support
+        msg.attach(MIMEText(text, 'plain'))
+        msg.attach(MIMEText(html, 'html'))
+        return msg
+
     def send_summaries(self, summaries):
+        start = time.perf_counter()
         try:
             if not summaries:
                 self.logger.warning("No summaries to send")
                 return False
 
-            msg = MIMEMultipart('alternative')
-            msg['Subject'] = f"Daily News Brief - {datetime.now().strftime('%Y-%m-%d')}"
-            msg['From'] = self.email_config['sender']
-            msg['To'] = self.email_config['sender']
-            msg['Bcc'] = ', '.join(self.email_config['recipients'])
-            
-            # Create HTML content
-            html_content = self.format_summaries_to_html(summaries)
-            msg.attach(MIMEText(html_content, 'html'))
-
-            # Send email
-            with smtplib.SMTP_SSL(self.email_config['smtp_server'], 
-                                self.email_config['smtp_port']) as server:
-                server.login(self.email_config['sender'], 
-                           self.email_config['password'])
-                # Send to sender and BCC recipients (without duplicating)
-                all_recipients = [self.email_config['sender']] + self.email_config['recipients']
-                server.sendmail(
-                    self.email_config['sender'],
-                    list(set(all_recipients)),  # Remove duplicates
-                    msg.as_string()
-                )
-
-            self.logger.info(f"Successfully sent email to {len(self.email_config['recipients'])} BCC recipients with {len(summaries)} summaries")
+            # Render each category section once, then put a digest together
+            # per distinct subscription set rather than per recipient
+            rendered = render_sections(self.group_by_category(summaries))
+            groups = self.recipient_groups(rendered)
+            deliveries = [
+                (self.build_message(*assemble_digest(rendered, self.digest_date(), categories)), recipients)
+                for categories, recipients in groups.items()
+            ]
+            self.logger.info(f"Rendered {len(rendered)} sections into {len(deliveries)} digests "
+                             f"for {sum(len(recipients) for recipients in groups.values())} recipients")
+
+            # Recipients only go in the envelope (BCC), batched over pooled connections
+            with self.connection_pool() as pool:
+                result = SMTPDelivery(pool).send(deliveries)
+
+            EMAIL_SECONDS.observe(time.perf_counter() - start)
+            if not result['sent']:
+                EMAIL_SENT.inc(outcome='error')
+                self.logger.error(f"Failed to send email to any of {len(result['failed'])} recipients")
+                return False
+
+            EMAIL_SENT.inc(outcome='partial' if result['failed'] else 'success')
+            self.logger.info(f"Successfully sent email to {len(result['sent'])} recipients with {len(summaries)} summaries"
+                             + (f" ({len(result['failed'])} failed)" if result['failed'] else ""))
             return True
 
         except Exception as e:
+            EMAIL_SECONDS.observe(time.perf_counter() - start)
+            EMAIL_SENT.inc(outcome='error')
             self.logger.error(f"Failed to send email: {str(e)}")
-            return False
\ No newline at end of file
+            return False
+
+    def connection_pool(self):
+        """A pool of authenticated connections to the configured SMTP server"""
+        return SMTPConnectionPool(
+            host=self.email_config['smtp_server'],
+            port=self.email_config['smtp_port'],
+            username=self.email_config['sender'],
+            password=self.email_config['password'],
+            use_ssl=self.email_config['smtp_use_ssl']
+        )
@@ -0,0 +1,109 @@
+import functools
+import threading
+from datetime import datetime
+from pathlib import Path
+from urllib.parse import urlsplit
+
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+from markupsafe import Markup
+
+from logger import setup_logger
+
+logger = setup_logger(__name__)
+
+TEMPLATE_DIR = Path(__file__).parent / 'templates'
+
+
+@functools.lru_cache(maxsize=4096)
+def format_date(published):
+    """Format a published date as e.g. "March 1, 2024"; accepts datetimes or ISO strings"""
+    try:
+        if isinstance(published, str):
+            published = datetime.fromisoformat(published)
+        return published.strftime('%B %d, %Y')
+    except Exception as e:
+        logger.warning(f"Error formatting date: {e}")
+        return "Date unavailable"
+
+
+def safe_url(url):
+    """Only let http(s) links into the email; anything else becomes a dead link"""
+    url = (url or '').strip()
+    return url if url[:8].lower().startswith(('http://', 'https://')) else '#'
+
+
+def host(url):
+    """Short site name for a link, e.g. nytimes.com"""
+    name = urlsplit(url or '').hostname or ''
+    return name[4:] if name.startswith('www.') else name
+
+
+_environment = None
+_environment_lock = threading.Lock()
+
+
+def get_template_environment():
+    """Return the shared Jinja environment.
+
+    Templates are compiled on first use and kept in the environment's cache
+    for the life of the process, so scheduled and server runs only pay for
+    compilation once. HTML templates are autoescaped; .txt templates are not.
+    """
+    global _environment
+    if _environment is None:
+        with _environment_lock:
+            if _environment is None:
+                environment = Environment(
+                    loader=FileSystemLoader(TEMPLATE_DIR),
+                    autoescape=select_autoescape(['html']),
+                    trim_blocks=True,
+                    lstrip_blocks=True,
+                    auto_reload=False
+                )
+                environment.filters['format_date'] = format_date
+                environment.filters['safe_url'] = safe_url
+                environment.filters['host'] = host
+                _environment = environment
+    return _environment
+
+
+def group_by_category(summaries, category_order):
+    """Group summaries into digest sections following category_order, unknown categories last"""
+    categorized = {}
+    for summary in summaries:
+        categorized.setdefault(summary.get('category', 'uncategorized'), []).append(summary)
+    ordered = [category for category in category_order if category in categorized]
+    ordered += [category for category in categorized if category not in category_order]
+    return [
+        {'category': category, 'title': category.replace('_', ' ').title(), 'articles': categorized[category]}
+        for category in ordered
+    ]
+
+
+def render_template(name, **context):
+    return get_template_environment().get_template(name).render(**context)
+
+
+def render_sections(sections):
+    """Render every category section once, as {category: (html, text)} in section order"""
+    environment = get_template_environment()
+    html_template = environment.get_template('section.html')
+    text_template = environment.get_template('section.txt')
+    # The HTML fragments are already escaped, so the layout can insert them as is
+    return {
+        section['category']: (Markup(html_template.render(section=section)), text_template.render(section=section))
+        for section in sections
+    }
+
+
+def assemble_digest(rendered, date, categories=None):
+    """Put pre-rendered sections into the digest layout; returns (html, text).
+
+    categories limits the digest to those sections (None means all), so a
+    digest per subscription set only costs a join of fragments.
+    """
+    parts = [part for category, part in rendered.items() if categories is None or category in categories]
+    return (
+        render_template('digest.html', sections=[html for html, _ in parts]),
+        render_template('digest.txt', sections=[text for _, text in parts], date=date)
+    )
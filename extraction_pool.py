@@ -0,0 +1,155 @@
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from config import EXTRACTOR_BACKEND, EXTRACTION_WORKERS, EXTRACTION_INLINE_BYTES, EXTRACTION_MIN_BATCH
+from extractors import SoupExtractor, get_extractor
+from logger import setup_logger, SAMPLED
+
+logger = setup_logger(__name__)
+
+
+def extract_text(extractor, html):
+    """Main text of a page, falling back to BeautifulSoup if the fast backend fails on it"""
+    try:
+        return extractor.extract(html)
+    except Exception as e:
+        if isinstance(extractor, SoupExtractor):
+            raise
+        logger.warning("%s extractor failed, falling back to soup: %s", extractor.name, e, extra=SAMPLED)
+        return SoupExtractor().extract(html)
+
+
+# Extractor of a pool worker process, created once by _init_worker
+_worker_extractor = None
+
+
+def _init_worker(backend):
+    global _worker_extractor
+    _worker_extractor = get_extractor(backend)
+
+
+def _extract_in_worker(html):
+    return extract_text(_worker_extractor, html)
+
+
+def _as_bytes(html):
+    return html.encode('utf-8') if isinstance(html, str) else html
+
+
+class ExtractionPool:
+    """Parses article pages in worker processes so extraction uses every core.
+
+    Parsing and walking the tree is CPU-bound Python that holds the GIL, so
+    extraction threads in one process take turns. Pages go to the workers as
+    UTF-8 bytes and only the extracted text comes back, which keeps the
+    pickling cost small next to the parse. Small pages, small batches and
+    pools of one worker are extracted on the calling thread instead, where
+    that costs less than the round trip.
+
+    Workers are started with spawn, so they never inherit the parent's
+    threads or locks, and only on first use. If a worker dies (e.g. killed
+    for running out of memory), the pool is replaced and the pages it was
+    working on are tried once more in the new one.
+    """
+
+    def __init__(self, workers=EXTRACTION_WORKERS, backend=EXTRACTOR_BACKEND,
+                 inline_bytes=EXTRACTION_INLINE_BYTES, min_batch=EXTRACTION_MIN_BATCH):
+        self.workers = max(0, workers)
+        self.backend = backend
+        self.inline_bytes = inline_bytes
+        self.min_batch = max(1, min_batch)
+        self.executor = None
+        self.lock = threading.Lock()
+        # In-process extractors are per thread; lxml parsers must not be shared
+        self.local = threading.local()
+
+    @property
+    def parallel(self):
+        return self.workers > 1
+
+    def _local_extractor(self):
+        extractor = getattr(self.local, 'extractor', None)
+        if extractor is None:
+            extractor = self.local.extractor = get_extractor(self.backend)
+        return extractor
+
+    def _executor(self):
+        if self.executor is None:
+            with self.lock:
+                if self.executor is None:
+                    self.executor = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context('spawn'),
+                        initializer=_init_worker,
+                        initargs=(self.backend,)
+                    )
+                    logger.info(f"Started {self.workers} extraction worker processes")
+        return self.executor
+
+    def _replace(self, executor, error):
+        """Drop a broken executor so the next call starts a new one"""
+        with self.lock:
+            if self.executor is not executor:
+                return  # Another thread already replaced it
+            self.executor = None
+        logger.warning(f"Extraction worker pool broke ({error}); starting a new one")
+        executor.shutdown(wait=False)
+
+    def _run(self, call):
+        """Return call(executor), retrying once with a new pool if a worker died"""
+        for attempt in range(2):
+            executor = self._executor()
+            try:
+                return call(executor)
+            except BrokenProcessPool as e:
+                self._replace(executor, e)
+                if attempt:
+                    raise
+
+    def start(self):
+        """Start the worker processes now rather than on the first large page"""
+        if self.parallel:
+            self._run(lambda executor: [
+                future.result() for future in [executor.submit(abs, 0) for _ in range(self.workers)]
+            ])
+        return self
+
+    def extract(self, html):
+        """Extract the main text of one page, or None if no content selector matches"""
+        if not self.parallel or len(html) < self.inline_bytes:
+            return extract_text(self._local_extractor(), html)
+        page = _as_bytes(html)
+        return self._run(lambda executor: executor.submit(_extract_in_worker, page).result())
+
+    def map(self, pages):
+        """Extract the main text of every page, in order"""
+        pages = list(pages)
+        if not self.parallel or len(pages) < self.min_batch:
+            extractor = self._local_extractor()
+            return [extract_text(extractor, html) for html in pages]
+        # A few chunks per worker: fewer round trips, still balanced if page sizes vary
+        chunksize = max(1, len(pages) // (self.workers * 4))
+        pages = [_as_bytes(html) for html in pages]
+        return self._run(lambda executor: list(executor.map(_extract_in_worker, pages, chunksize=chunksize)))
+
+    def close(self):
+        with self.lock:
+            if self.executor is not None:
+                self.executor.shutdown()
+                self.executor = None
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_extraction_pool():
+    """Return the process-wide extraction pool"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ExtractionPool()
+    return _pool
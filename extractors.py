@@ -0,0 +1,110 @@
+from bs4 import BeautifulSoup
+from config import EXTRACTOR_BACKEND
+from logger import setup_logger
+
+try:
+    import lxml.html
+    from lxml import etree
+except ImportError:  # lxml is optional, BeautifulSoup is always available
+    lxml = None
+
+logger = setup_logger(__name__)
+
+# Elements whose text never belongs to the article body
+UNWANTED_TAGS = ['script', 'style', 'nav', 'header', 'footer']
+
+# Common article content selectors, tried in order
+CONTENT_SELECTORS = [
+    'article',
+    '.article-content',
+    '.post-content',
+    '.entry-content',
+    'main',
+    '#content'
+]
+
+
+class SoupExtractor:
+    """Original extraction: full html.parser tree, strip unwanted elements, then try each selector"""
+
+    name = 'soup'
+
+    def extract(self, html):
+        """Return the main article text of a page, or None if no content selector matches"""
+        if isinstance(html, bytes):
+            html = html.decode('utf-8', errors='replace')
+        soup = BeautifulSoup(html, 'html.parser')
+
+        # Remove unwanted elements
+        for element in soup.find_all(UNWANTED_TAGS):
+            element.decompose()
+
+        for selector in CONTENT_SELECTORS:
+            content = soup.select_one(selector)
+            if content:
+                return content.get_text(separator=' ', strip=True)
+        return None
+
+
+class LxmlExtractor:
+    """Fast extraction on libxml2's C parser.
+
+    Instead of cleaning the whole document up front, only the first node
+    matching a content selector is cleaned, and text is read from that
+    subtree alone. Output matches SoupExtractor on well-formed pages.
+    """
+
+    name = 'lxml'
+
+    def __init__(self):
+        if lxml is None:
+            raise ImportError("lxml is not installed")
+        self.parser = lxml.html.HTMLParser(encoding='utf-8', remove_comments=True)
+        self.selectors = [etree.XPath(self._selector_to_xpath(s)) for s in CONTENT_SELECTORS]
+        self.inside_unwanted = etree.XPath(
+            ' | '.join(f'ancestor::{tag}' for tag in UNWANTED_TAGS)
+        )
+
+    @staticmethod
+    def _selector_to_xpath(selector):
+        if selector.startswith('.'):
+            return f"//*[contains(concat(' ', normalize-space(@class), ' '), ' {selector[1:]} ')]"
+        if selector.startswith('#'):
+            return f"//*[@id='{selector[1:]}']"
+        return f'//{selector}'
+
+    def extract(self, html):
+        """Return the main article text of a page, or None if no content selector matches"""
+        if isinstance(html, str):
+            html = html.encode('utf-8')
+        document = lxml.html.document_fromstring(html, parser=self.parser)
+
+        for selector in self.selectors:
+            for node in selector(document):
+                # SoupExtractor removes these elements before matching
+                if self.inside_unwanted(node):
+                    continue
+                etree.strip_elements(node, *UNWANTED_TAGS, with_tail=False)
+                return ' '.join(
+                    text.strip() for text in node.itertext() if text.strip()
+                )
+        return None
+
+
+EXTRACTORS = {
+    SoupExtractor.name: SoupExtractor,
+    LxmlExtractor.name: LxmlExtractor
+}
+
+
+def get_extractor(name=EXTRACTOR_BACKEND):
+    """Create the configured extractor, falling back to BeautifulSoup if it is unavailable"""
+    extractor_class = EXTRACTORS.get(name)
+    if extractor_class is None:
+        logger.warning(f"Unknown extractor backend '{name}', using '{SoupExtractor.name}'")
+        return SoupExtractor()
+    try:
+        return extractor_class()
+    except ImportError as e:
+        logger.warning(f"Extractor backend '{name}' unavailable ({e}), using '{SoupExtractor.name}'")
+        return SoupExtractor()
@@ -0,0 +1,72 @@
+import os
+from datetime import datetime
+import hashlib
+from pathlib import Path
+from storage import atomic_write_json, load_json
+from logger import setup_logger
+
+logger = setup_logger(__name__)
+
+class FeedCache:
+    """Remembers HTTP validators and a body hash for every feed so unchanged
+    feeds can be skipped without re-parsing them."""
+
+    def __init__(self, state_file='articles/processed/feed_state.json'):
+        # Use absolute paths
+        base_dir = os.environ.get('STORAGE_PATH', '/app/articles')
+        self.state_file = Path(base_dir) / 'processed' / 'feed_state.json'
+
+        # Create directories
+        os.makedirs(self.state_file.parent, exist_ok=True)
+
+        self.state = load_json(self.state_file, {})
+        logger.info(f"Loaded state for {len(self.state)} feeds from {self.state_file}")
+
+    def save(self):
+        """Save feed state to file atomically"""
+        atomic_write_json(self.state_file, self.state, indent=2, sort_keys=True)
+
+    @staticmethod
+    def hash_content(content):
+        """Hash a feed body so hosts that ignore validators can still be short-circuited"""
+        if isinstance(content, str):
+            content = content.encode('utf-8')
+        return hashlib.sha256(content).hexdigest()
+
+    def conditional_headers(self, feed_url):
+        """Return If-None-Match / If-Modified-Since headers for a previously seen feed"""
+        entry = self.state.get(feed_url, {})
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def is_unchanged(self, feed_url, content):
+        """Check whether a feed body is identical to the one seen last time"""
+        entry = self.state.get(feed_url)
+        return bool(entry) and entry.get('content_hash') == self.hash_content(content)
+
+    def update(self, feed_url, content, headers=None):
+        """Record the validators and body hash of a freshly fetched feed"""
+        headers = headers or {}
+        self.state.setdefault(feed_url, {}).update({
+            'etag': headers.get('ETag'),
+            'last_modified': headers.get('Last-Modified'),
+            'content_hash': self.hash_content(content),
+            'checked_at': datetime.now().isoformat()
+        })
+
+    def invalidate(self, feed_url):
+        """Forget a feed's validators so it is fully fetched and parsed on the next run"""
+        entry = self.state.get(feed_url, {})
+        for key in ('etag', 'last_modified', 'content_hash'):
+            entry.pop(key, None)
+
+    def get_schedule(self, feed_url):
+        """Polling state of a feed kept by FeedScheduler"""
+        return self.state.get(feed_url, {}).get('schedule', {})
+
+    def set_schedule(self, feed_url, schedule):
+        self.state.setdefault(feed_url, {})['schedule'] = schedule
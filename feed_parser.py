@@ -1,9 +1,13 @@
+import calendar
 import feedparser
-import requests
-from bs4 import BeautifulSoup
+import time
 from datetime import datetime, timedelta
-from config import MAX_ARTICLES, TIME_WINDOW
-from logger import setup_logger
+from urllib.parse import urlsplit
+from config import MAX_ARTICLES, TIME_WINDOW, FETCH_TIMEOUT
+from extraction_pool import get_extraction_pool
+from http_client import DownloadRejected, download
+from logger import setup_logger, SAMPLED
+from metrics import EXTRACT_INPUT_BYTES, EXTRACT_SECONDS, FETCH_BYTES, FETCH_REQUESTS, FETCH_SECONDS
 from dateutil import parser as date_parser
 
 def parse_date(date_str):
@@ -12,94 +16,179 @@ def parse_date(date_str):
     except (ValueError, TypeError):
         return datetime.now()  # Default to current time if parsing fails
 
+def extract_contents(pages, extraction_pool=None):
+    """Extract the main text of many pages in one batch (ExtractionPool.map); None for pages without content"""
+    extraction_pool = extraction_pool or get_extraction_pool()
+    if not pages:
+        return []
+    for html in pages:
+        EXTRACT_INPUT_BYTES.observe(len(html))
+    start = time.perf_counter()
+    texts = extraction_pool.map(pages)
+    # Pages of a batch are parsed together, so each is given its share of the batch time
+    per_page = (time.perf_counter() - start) / len(pages)
+    for _ in pages:
+        EXTRACT_SECONDS.observe(per_page, backend=extraction_pool.backend)
+    return texts
+
 class FeedParser:
-    def __init__(self, feed_url):
+    def __init__(self, feed_url, feed_cache=None, extraction_pool=None):
         self.feed_url = feed_url
+        self.feed_cache = feed_cache
+        self.extraction_pool = extraction_pool or get_extraction_pool()
+        self.published_times = []
         self.logger = setup_logger(__name__)
-        self.logger.info(f"Initialized FeedParser for {feed_url}")
+        self.logger.debug("Initialized FeedParser for %s", feed_url)
 
     def parse_feed(self):
         try:
             self.logger.info(f"Starting to parse feed: {self.feed_url}")
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-            }
-            response = requests.get(self.feed_url, headers=headers, timeout=10)
-            
-            if response.status_code != 200:
-                self.logger.error(f"Failed to fetch feed: {self.feed_url}, status: {response.status_code}")
+            headers = {}
+            if self.feed_cache:
+                headers.update(self.feed_cache.conditional_headers(self.feed_url))
+            response = self._get(self.feed_url, 'feed', headers=headers)
+
+            if response['status'] == 304:
+                self.logger.info(f"Feed not modified since last run: {self.feed_url}")
+                return []
+
+            if response['status'] != 200:
+                self.logger.error(f"Failed to fetch feed: {self.feed_url}, status: {response['status']}")
                 return []
 
-            feed = feedparser.parse(response.text)
-            entries = feed.entries[:MAX_ARTICLES]
-            
-            if not entries:
-                self.logger.info(f"No entries found in feed")
+            if self.is_unchanged(response['text'], response['headers']):
                 return []
-            
-            self.logger.info(f"Found {len(entries)} entries in feed")
-            
+
+            stubs = self.parse_entries(response['text'])
+
             articles = []
-            for entry in entries:
-                article = self.extract_article_text(entry)
+            for stub in stubs:
+                article = self.extract_article_text(stub)
                 if article:
                     articles.append(article)
-            
+
             return articles
-            
+
         except Exception as e:
             self.logger.error(f"Error parsing feed {self.feed_url}: {str(e)}")
             return []
 
-    def extract_article_text(self, entry):
+    def _get(self, url, kind, headers=None):
+        """Download through the shared session with http_client.download, recording fetch metrics"""
+        host = urlsplit(url).netloc.lower()
+        start = time.monotonic()
+        try:
+            response = download(url, kind, headers=headers, timeout=FETCH_TIMEOUT)
+        except DownloadRejected:
+            FETCH_REQUESTS.inc(host=host, kind=kind, status='rejected')
+            raise
+        except Exception:
+            FETCH_REQUESTS.inc(host=host, kind=kind, status='error')
+            raise
+        FETCH_SECONDS.observe(time.monotonic() - start, host=host, kind=kind)
+        FETCH_REQUESTS.inc(host=host, kind=kind, status=response['status'])
+        FETCH_BYTES.inc(response['bytes'], host=host, kind=kind)
+        return response
+
+    def is_unchanged(self, content, headers=None):
+        """Check the feed body against the feed cache and record the new validators.
+
+        Returns True when the body is byte-identical to the last fetch, in
+        which case there is nothing new to parse.
+        """
+        if not self.feed_cache:
+            return False
+        if self.feed_cache.is_unchanged(self.feed_url, content):
+            self.logger.info("Feed content unchanged since last run: %s", self.feed_url, extra=SAMPLED)
+            return True
+        self.feed_cache.update(self.feed_url, content, headers)
+        return False
+
+    def parse_entries(self, content):
+        """Parse an already downloaded feed body into stubs for its first MAX_ARTICLES entries.
+
+        Stubs only carry what the feed itself provides, so callers can drop
+        already processed links before any article page is downloaded.
+        The publish times (epoch seconds) of all entries, not only the first
+        MAX_ARTICLES, are left in self.published_times for the scheduler.
+        """
+        feed = feedparser.parse(content)
+        entries = feed.entries[:MAX_ARTICLES]
+        self.published_times = [
+            calendar.timegm(published)
+            for published in (entry.get('published_parsed') or entry.get('updated_parsed') for entry in feed.entries)
+            if published
+        ]
+
+        if not entries:
+            self.logger.info("No entries found in %s", self.feed_url, extra=SAMPLED)
+            return []
+
+        self.logger.info("Found %d entries in %s", len(entries), self.feed_url, extra=SAMPLED)
+        return [self.make_stub(entry) for entry in entries]
+
+    @staticmethod
+    def make_stub(entry):
+        """Reduce a feedparser entry to title, link, published date and feed summary"""
+        return {
+            'title': entry.get('title', ''),
+            'link': entry.get('link', ''),
+            'published': parse_date(entry.get('published', entry.get('updated', ''))),
+            'summary': entry.get('summary', '')
+        }
+
+    def fetch_article_html(self, link):
+        """Download an article page, returning its HTML or None on failure"""
+        try:
+            response = self._get(link, 'page')
+            if response['status'] == 200:
+                return response['text']
+        except Exception as e:
+            self.logger.warning("Failed to fetch full article content for %s: %s", link, e, extra=SAMPLED)
+        return None
+
+    def extract_content(self, html):
+        """Pull the main article text out of a page, or None if no content selector matches.
+
+        Uses the configured extractor backend and falls back to the
+        BeautifulSoup extractor if the fast backend fails on a page. Large
+        pages are parsed in the extraction worker pool.
+        """
+        EXTRACT_INPUT_BYTES.observe(len(html))
+        with EXTRACT_SECONDS.time(backend=self.extraction_pool.backend):
+            return self.extraction_pool.extract(html)
+
+    def build_article(self, stub, text):
+        """The article dict for an entry stub and its extracted text, falling back to the feed summary"""
+        return {
+            'title': stub['title'],
+            'link': stub['link'],
+            # If no content found with selectors, fall back to summary
+            'text': text or stub['summary'],
+            'published': stub['published']
+        }
+
+    def extract_article_text(self, stub, html=None):
+        """Build the full article dict for an entry stub.
+
+        The article page is downloaded unless its HTML is passed in; pass an
+        empty string when the download already failed elsewhere.
+        """
         try:
-            title = entry.get('title', '')
-            link = entry.get('link', '')
-            
+            link = stub['link']
+
             # First try to get the full article content by visiting the URL
-            try:
-                headers = {
-                    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-                }
-                response = requests.get(link, headers=headers, timeout=10)
-                if response.status_code == 200:
-                    soup = BeautifulSoup(response.text, 'html.parser')
-                    
-                    # Remove unwanted elements
-                    for element in soup.find_all(['script', 'style', 'nav', 'header', 'footer']):
-                        element.decompose()
-                    
-                    # Try common article content selectors
-                    article_content = None
-                    selectors = [
-                        'article', 
-                        '.article-content',
-                        '.post-content',
-                        '.entry-content',
-                        'main',
-                        '#content'
-                    ]
-                    
-                    for selector in selectors:
-                        content = soup.select_one(selector)
-                        if content:
-                            article_content = content.get_text(separator=' ', strip=True)
-                            break
-                    
-                    # If no content found with selectors, fall back to summary
-                    text = article_content if article_content else entry.get('summary', '')
-                else:
-                    text = entry.get('summary', '')
-            except Exception as e:
-                self.logger.warning(f"Failed to fetch full article content for {link}: {str(e)}")
-                text = entry.get('summary', '')
-            
-            return {
-                'title': title,
-                'link': link,
-                'text': text,
-                'published': parse_date(entry.get('published', entry.get('updated', '')))
-            }
+            if html is None:
+                html = self.fetch_article_html(link)
+
+            text = None
+            if html:
+                try:
+                    text = self.extract_content(html)
+                except Exception as e:
+                    self.logger.warning("Failed to extract article content for %s: %s", link, e, extra=SAMPLED)
+
+            return self.build_article(stub, text)
         except Exception as e:
             self.logger.error(f"Failed to extract article: {str(e)}")
-            return None
\ No newline at end of file
+            return None
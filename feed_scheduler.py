@@ -0,0 +1,94 @@
+import statistics
+import time
+
+from config import (
+    MAX_ARTICLES,
+    FEED_MIN_INTERVAL,
+    FEED_MAX_INTERVAL,
+    FEED_DEFAULT_INTERVAL,
+    FEED_POLL_HEADROOM,
+    FEED_BACKOFF_FACTOR
+)
+from logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Poll outcomes
+UPDATED = 'updated'            # new body, entries parsed
+NOT_MODIFIED = 'not_modified'  # 304
+UNCHANGED = 'unchanged'        # 200 with the same body as last time
+FAILED = 'failed'              # request failed or non-200
+
+# Most recent entries used to estimate how often a feed posts
+RECENT_ENTRIES = 20
+
+
+class FeedScheduler:
+    """Learns a polling interval per feed and decides which feeds are due.
+
+    The interval targets about FEED_POLL_HEADROOM * MAX_ARTICLES new entries
+    per poll, based on the gaps between the feed's recent publish times, so
+    fast feeds are polled often enough that nothing falls past the
+    MAX_ARTICLES cut-off and slow feeds are left alone. Every 304 or
+    unchanged body stretches the interval by FEED_BACKOFF_FACTOR. State is
+    kept with the rest of the feed state in FeedCache.
+    """
+
+    def __init__(self, feed_cache,
+                 min_interval=FEED_MIN_INTERVAL,
+                 max_interval=FEED_MAX_INTERVAL,
+                 default_interval=FEED_DEFAULT_INTERVAL,
+                 target_entries=MAX_ARTICLES * FEED_POLL_HEADROOM):
+        self.feed_cache = feed_cache
+        self.min_interval = min_interval
+        self.max_interval = max(min_interval, max_interval)
+        self.default_interval = default_interval
+        self.target_entries = max(target_entries, 1)
+
+    def due_feeds(self, feed_urls, now=None):
+        """Feeds whose next poll time has passed; feeds never polled are always due"""
+        now = now or time.time()
+        return [url for url in feed_urls if self.feed_cache.get_schedule(url).get('next_poll', 0) <= now]
+
+    def estimate_interval(self, published_times, now=None):
+        """Interval expected to see target_entries new entries, or None without enough history"""
+        now = now or time.time()
+        recent = sorted((t for t in published_times if t <= now), reverse=True)[:RECENT_ENTRIES]
+        if len(recent) < 2:
+            return None
+        gap = statistics.median(newer - older for newer, older in zip(recent, recent[1:]))
+        # A feed that has gone quiet posts less often than its old gaps suggest
+        gap = max(gap, now - recent[0])
+        return gap * self.target_entries
+
+    def record_poll(self, feed_url, outcome, published_times=(), now=None):
+        """Update a feed's interval from the outcome of a poll and schedule its next one"""
+        now = now or time.time()
+        schedule = dict(self.feed_cache.get_schedule(feed_url))
+        interval = schedule.get('interval', self.default_interval)
+        last_poll = schedule.get('last_poll')
+
+        if outcome == UPDATED:
+            estimate = self.estimate_interval(published_times, now)
+            if estimate is not None:
+                # Smooth over one noisy window, but follow a real change in rate
+                interval = estimate if 'interval' not in schedule else (interval + estimate) / 2
+            new_entries = sum(1 for t in published_times if last_poll and t > last_poll)
+            if new_entries > MAX_ARTICLES:
+                logger.warning(f"{feed_url} published {new_entries} entries since the last poll; "
+                               f"only {MAX_ARTICLES} are kept, polling it more often")
+                interval = min(interval, (now - last_poll) * self.target_entries / new_entries)
+            schedule['unchanged_streak'] = 0
+        elif outcome in (NOT_MODIFIED, UNCHANGED):
+            interval *= FEED_BACKOFF_FACTOR
+            schedule['unchanged_streak'] = schedule.get('unchanged_streak', 0) + 1
+
+        interval = min(max(interval, self.min_interval), self.max_interval)
+        schedule.update({
+            'interval': round(interval),
+            'last_poll': now,
+            'next_poll': now + interval,
+            'last_outcome': outcome
+        })
+        self.feed_cache.set_schedule(feed_url, schedule)
+        logger.debug("Next poll of %s in %.0f min (%s)", feed_url, interval / 60, outcome)
@@ -0,0 +1,143 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+from config import (
+    FETCH_MAX_CONCURRENCY,
+    FETCH_PER_HOST_CONCURRENCY,
+    FETCH_TIMEOUT
+)
+from http_client import DownloadRejected, download
+from logger import setup_logger, SAMPLED
+from metrics import FETCH_BYTES, FETCH_REQUESTS, FETCH_SECONDS
+
+logger = setup_logger(__name__)
+
+
+class HostLimiter:
+    """Caps how many requests are in flight against one host and across all hosts"""
+
+    def __init__(self, per_host=FETCH_PER_HOST_CONCURRENCY, max_concurrency=FETCH_MAX_CONCURRENCY):
+        self.per_host = max(1, per_host)
+        self.slots = {}
+        self.global_slots = threading.BoundedSemaphore(max(1, max_concurrency))
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def slot(self, url):
+        host = urlsplit(url).netloc.lower()
+        with self.lock:
+            semaphore = self.slots.setdefault(host, threading.Semaphore(self.per_host))
+        # Take the host slot first so requests queued behind a busy host
+        # don't hold global slots that other hosts could be using
+        with semaphore, self.global_slots:
+            yield
+
+
+class Fetcher:
+    """Downloads URLs through the shared pooled session within a global and a per-host limit.
+
+    Every fetch() waits for a slot from the fetcher's HostLimiter, so the
+    limits hold however many threads call it (the pipeline's feed and page
+    stages together, or fetch_all). Pages from the same host reuse warm
+    connections.
+    """
+
+    def __init__(self,
+                 max_concurrency=FETCH_MAX_CONCURRENCY,
+                 per_host_concurrency=FETCH_PER_HOST_CONCURRENCY,
+                 timeout=FETCH_TIMEOUT):
+        self.max_concurrency = max(1, max_concurrency)
+        self.limiter = HostLimiter(per_host_concurrency, self.max_concurrency)
+        self.timeout = timeout
+        self.timings = []
+
+    def fetch_all(self, urls, headers=None, kind='page'):
+        """Fetch every URL concurrently and return a dict mapping url -> result dict.
+
+        headers optionally maps a URL to extra request headers for it, and
+        kind ('feed' or 'page') labels the fetch metrics.
+        Result dicts are those of fetch().
+        """
+        unique_urls = list(dict.fromkeys(url for url in urls if url))
+        if not unique_urls:
+            return {}
+
+        headers = headers or {}
+        start = time.monotonic()
+        with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(unique_urls))) as executor:
+            results = list(executor.map(lambda url: self.fetch(url, headers.get(url), kind), unique_urls))
+        elapsed = time.monotonic() - start
+        logger.info(
+            f"Fetched {len(unique_urls)} URLs in {elapsed:.2f}s "
+            f"(sum of request times: {sum(r['elapsed'] for r in results):.2f}s)"
+        )
+        return {result['url']: result for result in results}
+
+    def fetch(self, url, headers=None, kind='page'):
+        """Fetch a single URL on the calling thread, once a slot is free, and return its result dict.
+
+        Result dicts contain 'url', 'status', 'text', 'headers', 'bytes',
+        'truncated', 'elapsed' and 'error'. 'status' is None when the request
+        itself failed or the response was rejected by http_client.download.
+        """
+        with self.limiter.slot(url):
+            return self._fetch(url, headers, kind)
+
+    def _fetch(self, url, headers, kind):
+        host = urlsplit(url).netloc.lower()
+        start = time.monotonic()
+        try:
+            result = download(url, kind, headers=headers, timeout=self.timeout)
+            result['error'] = None
+            outcome = result['status']
+        except DownloadRejected as e:
+            logger.info("Skipped %s: %s", url, e, extra=SAMPLED)
+            result = self._failed(url, e)
+            outcome = 'rejected'
+        except Exception as e:
+            result = self._failed(url, e)
+            outcome = 'error'
+        result['elapsed'] = time.monotonic() - start
+
+        FETCH_REQUESTS.inc(host=host, kind=kind, status=outcome)
+        FETCH_BYTES.inc(result['bytes'], host=host, kind=kind)
+        FETCH_SECONDS.observe(result['elapsed'], host=host, kind=kind)
+        self.timings.append({
+            'url': url,
+            'host': host,
+            'status': result['status'],
+            'elapsed': result['elapsed']
+        })
+        logger.debug("Fetched %s status=%s in %.2fs", url, result['status'], result['elapsed'])
+        return result
+
+    @staticmethod
+    def _failed(url, error):
+        return {'url': url, 'status': None, 'text': None, 'headers': {}, 'bytes': 0, 'truncated': False,
+                'error': str(error)}
+
+    def log_timings(self, limit=10):
+        """Log a per-host breakdown and the slowest URLs fetched so far"""
+        if not self.timings:
+            return
+
+        hosts = {}
+        for timing in self.timings:
+            host = hosts.setdefault(timing['host'], {'count': 0, 'total': 0.0, 'max': 0.0})
+            host['count'] += 1
+            host['total'] += timing['elapsed']
+            host['max'] = max(host['max'], timing['elapsed'])
+
+        logger.info(f"Fetch timings for {len(self.timings)} URLs across {len(hosts)} hosts")
+        for name, host in sorted(hosts.items(), key=lambda item: item[1]['max'], reverse=True)[:limit]:
+            logger.info(
+                f"  {name}: {host['count']} requests, "
+                f"avg {host['total'] / host['count']:.2f}s, max {host['max']:.2f}s"
+            )
+
+        logger.info(f"Slowest {min(limit, len(self.timings))} URLs:")
+        for timing in sorted(self.timings, key=lambda t: t['elapsed'], reverse=True)[:limit]:
+            logger.info(f"  {timing['elapsed']:.2f}s status={timing['status']} {timing['url']}")
@@ -0,0 +1,163 @@
+import codecs
+import random
+import re
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from config import (
+    USER_AGENT,
+    HTTP_POOL_CONNECTIONS,
+    HTTP_POOL_MAXSIZE,
+    HTTP_MAX_RETRIES,
+    HTTP_BACKOFF_FACTOR,
+    HTTP_BACKOFF_MAX,
+    HTTP_RETRY_STATUSES,
+    FETCH_TIMEOUT,
+    FETCH_MAX_BYTES,
+    FETCH_CONTENT_TYPES,
+    FETCH_CHUNK_BYTES
+)
+from metrics import FETCH_TRUNCATED
+
+_session = None
+_session_lock = threading.Lock()
+
+# A <meta charset> or XML encoding declaration near the top of the body
+_DECLARED_CHARSET = re.compile(rb'''(?:charset|encoding)\s*=\s*["']?([A-Za-z0-9_.:-]+)''', re.IGNORECASE)
+# How far into the body a declared charset is looked for
+_CHARSET_SNIFF_BYTES = 1024
+
+
+class DownloadRejected(Exception):
+    """A response whose body wasn't read: wrong Content-Type, unknown charset or too large"""
+
+
+class JitteredRetry(Retry):
+    """Retry policy using "full jitter" exponential backoff.
+
+    Spreading retries over [0, backoff] keeps a burst of failed requests
+    against one host from retrying in lockstep. A Retry-After header on
+    429/503 responses still takes precedence, but is capped at
+    HTTP_BACKOFF_MAX too, so a host asking for hours can't stall a worker.
+    """
+
+    def get_backoff_time(self):
+        backoff = min(super().get_backoff_time(), HTTP_BACKOFF_MAX)
+        return random.uniform(0, backoff) if backoff > 0 else 0
+
+    def get_retry_after(self, response):
+        retry_after = super().get_retry_after(response)
+        return None if retry_after is None else min(retry_after, HTTP_BACKOFF_MAX)
+
+
+def create_session():
+    """Build a requests session with pooled keep-alive connections and retries"""
+    retry = JitteredRetry(
+        total=HTTP_MAX_RETRIES,
+        backoff_factor=HTTP_BACKOFF_FACTOR,
+        status_forcelist=HTTP_RETRY_STATUSES,
+        allowed_methods=frozenset(['GET', 'HEAD']),
+        respect_retry_after_header=True,
+        raise_on_status=False  # Hand the final response back instead of raising
+    )
+    adapter = HTTPAdapter(
+        pool_connections=HTTP_POOL_CONNECTIONS,
+        pool_maxsize=HTTP_POOL_MAXSIZE,
+        max_retries=retry
+    )
+
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.headers.update({
+        'User-Agent': USER_AGENT,
+        'Connection': 'keep-alive'
+    })
+    return session
+
+
+def get_session():
+    """Return the process-wide session so every fetch reuses warm connections"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = create_session()
+    return _session
+
+
+def close_session():
+    """Close the shared session and drop its pooled connections"""
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
+
+
+def body_encoding(content_type, head):
+    """Charset to decode a body with: the Content-Type's, else one declared in the body, else UTF-8"""
+    match = re.search(r'charset\s*=\s*["\']?([^;"\'\s]+)', content_type, re.IGNORECASE)
+    if match:
+        encoding = match.group(1)
+    else:
+        declared = _DECLARED_CHARSET.search(head[:_CHARSET_SNIFF_BYTES])
+        encoding = declared.group(1).decode('ascii') if declared else 'utf-8'
+    try:
+        encoding = codecs.lookup(encoding).name
+    except LookupError:
+        raise DownloadRejected(f"unknown charset {encoding!r}")
+    return 'utf-8-sig' if encoding == 'utf-8' and head.startswith(codecs.BOM_UTF8) else encoding
+
+
+def download(url, kind='page', headers=None, timeout=FETCH_TIMEOUT):
+    """GET a feed or page through the shared session, reading at most FETCH_MAX_BYTES[kind] of it.
+
+    The body is streamed and decoded chunk by chunk, so a fetch never holds
+    more than the cap plus one chunk. Returns a dict with 'url', 'status',
+    'text', 'headers', 'bytes' and 'truncated'; 'text' is only read for 200
+    responses. Raises DownloadRejected when the Content-Type isn't one of
+    FETCH_CONTENT_TYPES[kind] or Content-Length is over the cap (both
+    before any of the body is read), or when the charset is unknown.
+    """
+    max_bytes = FETCH_MAX_BYTES[kind]
+    with get_session().get(url, headers=headers, timeout=timeout, stream=True) as response:
+        result = {
+            'url': url,
+            'status': response.status_code,
+            'text': None,
+            'headers': response.headers,
+            'bytes': 0,
+            'truncated': False
+        }
+        if response.status_code != 200:
+            return result
+
+        content_type = response.headers.get('Content-Type', '')
+        media_type = content_type.split(';', 1)[0].strip().lower()
+        if media_type and not any(accepted in media_type for accepted in FETCH_CONTENT_TYPES[kind]):
+            raise DownloadRejected(f"unexpected content type {media_type}")
+        length = response.headers.get('Content-Length', '')
+        if length.isdigit() and int(length) > max_bytes:
+            raise DownloadRejected(f"{length} bytes is over the {max_bytes} byte limit")
+
+        decoder = None
+        parts = []
+        for chunk in response.iter_content(FETCH_CHUNK_BYTES):
+            if decoder is None:
+                decoder = codecs.getincrementaldecoder(body_encoding(content_type, chunk))(errors='replace')
+            chunk = chunk[:max_bytes - result['bytes']]
+            result['bytes'] += len(chunk)
+            parts.append(decoder.decode(chunk))
+            if result['bytes'] >= max_bytes:
+                # The article body is near the top; drop the connection rather than read the rest
+                result['truncated'] = True
+                FETCH_TRUNCATED.inc(kind=kind)
+                break
+        if decoder is not None:
+            parts.append(decoder.decode(b'', final=True))
+        result['text'] = ''.join(parts)
+        return result
@@ -0,0 +1,120 @@
+import threading
+import traceback
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Finished jobs kept around for /runs/<id> lookups
+MAX_FINISHED_JOBS = 50
+
+
+class RunProgress:
+    """Per-stage progress of a single run, updated by run_daily as it goes"""
+
+    def __init__(self, job, lock):
+        self.job = job
+        self.lock = lock
+
+    def update(self, stage, done=None, total=None, **details):
+        """Record progress for a stage, e.g. update('summaries_done', 3, 10)"""
+        with self.lock:
+            entry = self.job['progress'].setdefault(stage, {})
+            if done is not None:
+                entry['done'] = done
+            if total is not None:
+                entry['total'] = total
+            entry.update(details)
+            self.job['stage'] = stage
+
+
+class RunQueue:
+    """Runs a job function on one background worker thread, one run at a time.
+
+    Triggers that arrive while a run is already queued are merged into that
+    queued run, so a burst of triggers costs at most one extra run after the
+    one in progress.
+    """
+
+    def __init__(self, target):
+        self.target = target
+        self.jobs = OrderedDict()
+        self.queued = None
+        self.running = None
+        self.lock = threading.Lock()
+        self.wakeup = threading.Condition(self.lock)
+        self.worker = None
+
+    def submit(self):
+        """Queue a run, or merge into the one already queued. Returns (job snapshot, merged)."""
+        with self.lock:
+            if self.queued is not None:
+                self.queued['triggers'] += 1
+                logger.info(f"Merged trigger into queued run {self.queued['id']}")
+                return dict(self.queued), True
+
+            job = {
+                'id': uuid.uuid4().hex[:12],
+                'status': 'queued',
+                'stage': None,
+                'triggers': 1,
+                'created_at': datetime.now().isoformat(),
+                'started_at': None,
+                'finished_at': None,
+                'progress': {},
+                'error': None
+            }
+            self.jobs[job['id']] = job
+            self.queued = job
+            self._prune()
+            self._ensure_worker()
+            self.wakeup.notify()
+            logger.info(f"Queued run {job['id']}")
+            return dict(job), False
+
+    def get(self, job_id):
+        """Return a snapshot of a job, or None if it is unknown"""
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return None
+            snapshot = dict(job)
+            snapshot['progress'] = {stage: dict(values) for stage, values in job['progress'].items()}
+            return snapshot
+
+    def _ensure_worker(self):
+        if self.worker is None or not self.worker.is_alive():
+            self.worker = threading.Thread(target=self._work, name='run-worker', daemon=True)
+            self.worker.start()
+
+    def _prune(self):
+        finished = [job_id for job_id, job in self.jobs.items() if job['finished_at']]
+        for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self.jobs[job_id]
+
+    def _work(self):
+        while True:
+            with self.lock:
+                while self.queued is None:
+                    self.wakeup.wait()
+                job = self.running = self.queued
+                self.queued = None
+                job['status'] = 'running'
+                job['started_at'] = datetime.now().isoformat()
+
+            logger.info(f"Starting run {job['id']}")
+            try:
+                self.target(progress=RunProgress(job, self.lock))
+                status, error = 'succeeded', None
+            except Exception as e:
+                logger.error(f"Run {job['id']} failed: {str(e)}\n{traceback.format_exc()}")
+                status, error = 'failed', str(e)
+
+            with self.lock:
+                job['status'] = status
+                job['error'] = error
+                job['finished_at'] = datetime.now().isoformat()
+                self.running = None
+            logger.info(f"Run {job['id']} {status}")
@@ -1,7 +1,20 @@
+import atexit
+import json
 import logging
+import multiprocessing
 import os
+import queue
+import threading
+import time
 from datetime import datetime
-from logging.handlers import RotatingFileHandler
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+from config import LOG_FORMAT, LOG_SAMPLE_BURST, LOG_SAMPLE_WINDOW
+
+# Pass as extra= on messages logged once per article, feed or request so
+# they are rate limited, e.g. logger.info("Fetched %s", url, extra=SAMPLED)
+SAMPLED = {'sampled': True}
+
 
 def setup_logger(name):
     # Check if logger already exists
@@ -13,11 +26,7 @@ def setup_logger(name):
     
     # Only add handlers and print header if this is a new logger
     if not logger.handlers:
-        console_handler = create_console_handler()
-        file_handler = create_file_handler()
-        
-        logger.addHandler(console_handler)
-        logger.addHandler(file_handler)
+        logger.addHandler(get_queue_handler())
         
         # Print run header only once
         if name == "__main__":  # Only print header for main logger
@@ -28,13 +37,114 @@ def setup_logger(name):
     
     return logger
 
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line; 'severity' and 'message' are the keys Cloud Logging reads"""
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'severity': record.levelname,
+            'logger': record.name,
+            'line': record.lineno,
+            'thread': record.threadName,
+            'message': record.getMessage()
+        }
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class RateLimitFilter(logging.Filter):
+    """Lets at most burst records per window through for each sampled message.
+
+    Only records logged with extra=SAMPLED are limited. They are grouped by
+    logger and message template (not the formatted message), so "Fetched %s"
+    for a thousand URLs counts as one message. The first record through after
+    some were dropped says how many.
+    """
+
+    def __init__(self, burst=LOG_SAMPLE_BURST, window=LOG_SAMPLE_WINDOW):
+        super().__init__()
+        self.burst = burst
+        self.window = window
+        self.lock = threading.Lock()
+        self.windows = {}
+
+    def filter(self, record):
+        if not getattr(record, 'sampled', False):
+            return True
+        key = (record.name, record.msg)
+        now = time.monotonic()
+        with self.lock:
+            started, count, dropped = self.windows.get(key, (now, 0, 0))
+            if now - started >= self.window:
+                started, count = now, 0
+            count += 1
+            allowed = count <= self.burst
+            self.windows[key] = (started, count, 0 if allowed else dropped + 1)
+            if len(self.windows) > 1000:
+                # Only f-string messages make new keys this fast; forget the stale ones
+                self.windows = {k: v for k, v in self.windows.items() if now - v[0] < self.window}
+        if allowed and dropped:
+            record.msg = f"{record.msg} ({dropped} similar messages suppressed)"
+        return allowed
+
+
+class _QueueHandler(QueueHandler):
+    def prepare(self, record):
+        # The queue never leaves the process, so records are passed as they
+        # are and only formatted on the listener thread
+        return record
+
+
+_queue_handler = None
+_listener = None
+_queue_lock = threading.Lock()
+
+
+def get_queue_handler():
+    """Return the handler shared by every logger set up here.
+
+    Logging calls only put the record on a queue; a single background
+    thread formats it and writes it to the console and the log file, so
+    worker threads never wait on disk or on each other's writes. Records
+    below a logger's level are rejected before a record is even created,
+    so with %-style arguments suppressed messages cost nothing.
+
+    Child processes (the extraction workers) only log to the console; the
+    log file is written and rotated by the main process alone.
+    """
+    global _queue_handler, _listener
+    if _queue_handler is None:
+        with _queue_lock:
+            if _queue_handler is None:
+                records = queue.SimpleQueue()
+                handlers = [create_console_handler()]
+                # Spawned children are named before they import this module,
+                # whereas parent_process() is only set once they start running
+                if multiprocessing.current_process().name == 'MainProcess':
+                    handlers.append(create_file_handler())
+                _listener = QueueListener(records, *handlers, respect_handler_level=True)
+                _listener.start()
+                # Write out whatever is still queued when the process exits
+                atexit.register(_listener.stop)
+                handler = _QueueHandler(records)
+                handler.addFilter(RateLimitFilter())
+                _queue_handler = handler
+    return _queue_handler
+
+
+def create_formatter(fmt, datefmt):
+    return JsonFormatter() if LOG_FORMAT == 'json' else logging.Formatter(fmt, datefmt=datefmt)
+
+
 def create_console_handler():
     """Create and configure console handler"""
     console_handler = logging.StreamHandler()
     console_handler.setLevel(logging.INFO)
     
     # Create a custom formatter for console output
-    console_format = logging.Formatter(
+    console_format = create_formatter(
         '%(asctime)s | %(levelname)-8s | %(message).500s',
         datefmt='%H:%M:%S'
     )
@@ -54,7 +164,7 @@ def create_file_handler():
     file_handler.setLevel(logging.DEBUG)
     
     # Use similar format to console but with milliseconds
-    file_format = logging.Formatter(
+    file_format = create_formatter(
         '[%(asctime)s] %(levelname)-8s [%(name)s:%(lineno)d] %(message).500s',  # Limit message length
         datefmt='%Y-%m-%d %H:%M:%S'
     )
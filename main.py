@@ -1,14 +1,25 @@
 from feed_parser import FeedParser
-from summarizer import Summarizer
+from fetcher import Fetcher
+from pipeline import Pipeline, SummarySink, summaries_from_journal
+from run_journal import RunJournal, FETCHED, SUMMARIZED, EMITTED, EMAILED
+from feed_scheduler import FeedScheduler
+from config import DIGEST_TIMES
+from summarizer import Summarizer, retryable_errors
 from email_sender import EmailSender
 import json
 from datetime import datetime
-import schedule
 import time
 from logger import setup_logger, log_section, log_summary
 import argparse
 import logging
 from article_cache import ArticleCache
+from feed_cache import FeedCache
+from storage import atomic_write_json
+from metrics import CACHE_LOOKUPS, REGISTRY, RUN_STAGE_SECONDS, cache_hit_ratios, metrics_since
+from email_templates import get_template_environment
+from http_client import get_session
+from text_budget import get_token_counter
+from extraction_pool import get_extraction_pool
 import os
 from pathlib import Path
 
@@ -17,8 +28,11 @@ logger = setup_logger(__name__)
 # Set logger to only show INFO and above (will skip DEBUG level messages)
 logger.setLevel(logging.INFO)
 
-def load_config():
-    logger.info("Attempting to load configuration")
+def load_config(verbose=True):
+    """Load config.json; without verbose (every minute's poll) progress is only logged at DEBUG"""
+    info = logger.info if verbose else logger.debug
+    warning = logger.warning if verbose else logger.debug
+    info("Attempting to load configuration")
     config_paths = [
         '/app/config/config.json',  # Cloud Run mounted volume
         'config.json'               # Local development
@@ -26,13 +40,13 @@ def load_config():
     
     for path in config_paths:
         try:
-            logger.info(f"Trying to load config from: {path}")
+            info(f"Trying to load config from: {path}")
             with open(path, 'r') as f:
                 config = json.load(f)
-                logger.info(f"Successfully loaded config from {path}")
+                info(f"Successfully loaded config from {path}")
                 return config
         except FileNotFoundError:
-            logger.warning(f"Config not found at {path}")
+            warning(f"Config not found at {path}")
             continue
     
     raise FileNotFoundError("Could not find config.json in any location")
@@ -82,114 +96,218 @@ def process_feeds(feed_urls):
     else:
         logger.error("Failed to send email")
 
-def run_daily():
-    logger = setup_logger(__name__)
-    summarizer = Summarizer()
-    cache = ArticleCache()
-    all_summaries = []
-    
-    logger.info("Starting daily run")
-    
-    # Load config first
+def finish_stage(stage, started, stage_times):
+    """Record how long a run_daily stage took and return the start time of the next one"""
+    elapsed = time.perf_counter() - started
+    stage_times[stage] = round(elapsed, 3)
+    RUN_STAGE_SECONDS.observe(elapsed, stage=stage)
+    return time.perf_counter()
+
+def write_metrics_report(stage_times, snapshot):
+    """Dump this run's stage timings and metrics to articles/reports.
+
+    snapshot is REGISTRY.to_dict() from the start of the run; only the
+    change since then is written, as the registry lives for the whole process.
+    """
+    metrics = metrics_since(snapshot)
+    output_dir = Path(__file__).parent / 'articles' / 'reports'
+    os.makedirs(output_dir, exist_ok=True)
+    filepath = output_dir / f"metrics_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    atomic_write_json(filepath, {
+        'generated_at': datetime.now().isoformat(),
+        'stage_seconds': stage_times,
+        'cache_hit_ratios': cache_hit_ratios(metrics[CACHE_LOOKUPS.name]),
+        'metrics': metrics
+    }, indent=2)
+    return filepath
+
+def load_feed_urls(verbose=True):
     try:
-        config = load_config()
+        config = load_config(verbose)
         feed_urls = config['feed_urls']
-        logger.info(f"Loaded {len(feed_urls)} feed URLs from config")
+        (logger.info if verbose else logger.debug)(f"Loaded {len(feed_urls)} feed URLs from config")
+        return feed_urls
     except Exception as e:
         logger.error(f"Failed to load config: {str(e)}")
         raise
 
-    total_feeds = len(feed_urls)
-    processed_feeds = 0
-    
-    for feed_url in feed_urls:
-        processed_feeds += 1
-        logger.info(f"Progress: {processed_feeds}/{total_feeds} feeds ({(processed_feeds/total_feeds)*100:.1f}%)")
-        logger.info(f"Processing feed: {feed_url}")
-        
-        try:
-            parser = FeedParser(feed_url)  # Create parser once
-            articles = parser.parse_feed()  # Parse feed once
-            
-            if not articles:
-                logger.warning(f"No articles found in {feed_url}")
-                continue
-                
-            logger.info(f"Found {len(articles)} articles in {feed_url}")
-            
-            # Process only new articles
-            new_articles = []
-            for article in articles:
-                is_cached = cache.is_processed(article['link'])
-                logger.info(f"Article {article['link']} cached: {is_cached}")
-                if not is_cached:
-                    new_articles.append(article)
-            if new_articles:
-                logger.info(f"Found {len(new_articles)} new articles to process")
-                for article in new_articles:
-                    summary = summarizer.summarize(article['text'])
-                    if summary:
-                        cache.add_article(article['link'])
-                        summary_with_metadata = {
-                            'title': article['title'],
-                            'link': article['link'],
-                            'published': article['published'],
-                            'source': feed_url,
-                            **summary  # Unpack the summary and category
-                        }
-                        all_summaries.append(summary_with_metadata)
-            else:
-                logger.info("Found 0 new articles to process")
-                
-        except Exception as e:
-            logger.error(f"Error processing feed {feed_url}: {str(e)}")
-
-    if all_summaries:
-        # Convert datetime objects to strings before saving
-        formatted_summaries = []
-        for summary in all_summaries:
-            formatted_summary = summary.copy()
-            if 'published' in formatted_summary:
-                formatted_summary['published'] = formatted_summary['published'].isoformat()
-            formatted_summaries.append(formatted_summary)
-            
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        
-        # Get project root directory and create output path
-        project_root = Path(__file__).parent
-        output_dir = project_root / 'articles' / 'summaries'
-        os.makedirs(output_dir, exist_ok=True)
-        
-        filename = f'summaries_{timestamp}.json'
-        filepath = output_dir / filename
-        
+def process_feed_urls(feed_urls, journal, resumed=(), progress=None):
+    """Run the pipeline over feed_urls and save its state; returns (summaries, stage_times)"""
+    summarizer = Summarizer()
+    cache = ArticleCache()
+    feed_cache = FeedCache()
+
+    # Stream feeds -> pages -> summaries, appending each summary to a JSONL
+    # file as soon as it completes so a crash keeps the work already done
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    output_dir = Path(__file__).parent / 'articles' / 'summaries'
+    sink = SummarySink(str(output_dir / f'summaries_{timestamp}.jsonl'))
+    fetcher = Fetcher()
+    log_section(logger, "Processing feeds")
+    try:
         try:
-            with open(filepath, 'w') as f:
-                json.dump(formatted_summaries, f, indent=2)
-            logger.info(f"Summaries saved successfully to {filepath}")
-        except Exception as e:
-            logger.error(f"Error saving summaries: {str(e)}")
+            summaries, stage_times = Pipeline(
+                feed_urls, fetcher, summarizer, cache, feed_cache, sink,
+                progress=progress, journal=journal, resumed=resumed,
+                scheduler=FeedScheduler(feed_cache)
+            ).run()
+        finally:
+            sink.close()
+        fetcher.log_timings()
+        stage_started = time.perf_counter()
+        if sink.count:
+            logger.info(f"Saved {sink.count} summaries to {sink.filepath}")
+
+        # Commit the batch of processed articles before anything else can fail
+        cache.flush()
 
+        # Only remember feed validators once their new articles have been handled
+        feed_cache.save()
+        summarizer.save_cache()
+        finish_stage('save_state', stage_started, stage_times)
+    finally:
+        # Closes the database connection and the archive index, every poll included
+        cache.close()
+    return summaries, stage_times
+
+def email_summaries(summaries, journal, stage_times, progress=None):
+    """Email summaries and mark them emailed in the journal"""
+    stage_started = time.perf_counter()
+    if summaries:
         # Send email
         logger.info("Initiating email sending")
         email_sender = EmailSender()
-        if email_sender.send_summaries(all_summaries):
+        email_sent = email_sender.send_summaries(summaries)
+        if email_sent:
             logger.info("Email sent successfully")
+            for summary in summaries:
+                journal.record(summary['link'], EMAILED)
+                # Duplicates went out as the summary's related links
+                for related in summary.get('related', []):
+                    journal.record(related['link'], EMAILED)
         else:
             logger.error("Failed to send email")
+        finish_stage('email', stage_started, stage_times)
+        if progress:
+            progress.update('email_sent', sent=email_sent, summaries=len(summaries))
     else:
         logger.warning("No summaries to save or send")
+        if progress:
+            progress.update('email_sent', sent=False, summaries=0)
+
+    # Drop emailed articles; anything else is left for the next --resume
+    journal.compact()
+
+def save_metrics_report(stage_times, snapshot):
+    try:
+        report_path = write_metrics_report(stage_times, snapshot)
+        logger.info(f"Stage timings: {stage_times}; metrics report saved to {report_path}")
+    except Exception as e:
+        logger.error(f"Error saving metrics report: {str(e)}")
+
+def run_daily(progress=None, resume=False):
+    """Fetch, summarize and email new articles from every configured feed.
 
-def main():
+    progress, if given, receives per-stage updates through
+    progress.update(stage, done, total, ...) (see jobs.RunProgress).
+    With resume, articles an interrupted run left in the run journal are
+    finished and emailed along with the new ones.
+    """
+    logger.info("Starting daily run")
+    snapshot = REGISTRY.to_dict()
+    feed_urls = load_feed_urls()
+    journal = RunJournal()
+    try:
+        unfinished = journal.pending(due=True)
+        if unfinished and not resume:
+            logger.warning(f"{len(unfinished)} articles from an interrupted run are unfinished; "
+                           f"run with --resume to send them")
+        summaries, stage_times = process_feed_urls(
+            feed_urls, journal, resumed=unfinished if resume else [], progress=progress
+        )
+        email_summaries(summaries, journal, stage_times, progress=progress)
+    finally:
+        journal.close()
+    save_metrics_report(stage_times, snapshot)
+
+def poll_due_feeds():
+    """Fetch and summarize the feeds whose polling interval has elapsed, without emailing.
+
+    New summaries wait in the run journal until the next send_digest(), so
+    feeds can be polled as often as they post while the digest still goes
+    out at fixed times. Errors are logged rather than raised, so one failed
+    poll doesn't stop the scheduler.
+    """
+    try:
+        # Runs every minute; the config is re-read so edits apply, but quietly
+        feed_urls = FeedScheduler(FeedCache()).due_feeds(load_feed_urls(verbose=False))
+        journal = RunJournal()
+        try:
+            # Anything a killed poll left half done is picked up by the next one,
+            # and failed summaries once their retry delay is up
+            unfinished = journal.pending((FETCHED, SUMMARIZED), due=True)
+            if feed_urls or unfinished:
+                logger.info(f"Polling {len(feed_urls)} due feeds")
+                process_feed_urls(feed_urls, journal, resumed=unfinished)
+        finally:
+            journal.close()
+    except Exception:
+        logger.exception("Feed poll failed; trying again at the next poll")
+
+def send_digest():
+    """Email every summary collected by the polls since the last digest.
+
+    Errors are logged rather than raised; unsent summaries stay in the
+    journal for the next digest.
+    """
+    logger.info("Sending digest")
+    try:
+        snapshot = REGISTRY.to_dict()
+        journal = RunJournal()
+        stage_times = {}
+        try:
+            summaries = list(summaries_from_journal(journal.pending((EMITTED,))).values())
+            email_summaries(summaries, journal, stage_times)
+        finally:
+            journal.close()
+        save_metrics_report(stage_times, snapshot)
+    except Exception:
+        logger.exception("Sending the digest failed")
+
+def warm_up():
+    """Load everything a run needs up front, so the first run doesn't pay for it.
+
+    Importing this module already pulled in the pipeline; this also loads
+    the OpenAI SDK, compiles the email templates, opens the shared HTTP
+    session, loads the tokenizer and starts the extraction workers. Safe to call more than once.
+    """
+    started = time.perf_counter()
+    retryable_errors()
+    environment = get_template_environment()
+    for name in ('digest.html', 'digest.txt', 'section.html', 'section.txt'):
+        environment.get_template(name)
+    get_session()
+    get_token_counter()
+    get_extraction_pool().start()
+    elapsed = time.perf_counter() - started
+    logger.info(f"Warmed up in {elapsed:.2f}s")
+    return elapsed
+
+def main(resume=False):
     logger = setup_logger(__name__)
     logger.info("Starting Feed Summarizer application")
+    import schedule
     
-    # Schedule jobs
-    schedule.every().day.at("09:00").do(run_daily)
-    schedule.every().day.at("17:00").do(run_daily)
-    
-    logger.info("Scheduled jobs: 9:00 AM and 5:00 PM daily")
-    
+    # Each feed is polled on its own interval; summaries wait for the digest
+    schedule.every().minute.do(poll_due_feeds)
+    for digest_time in DIGEST_TIMES:
+        schedule.every().day.at(digest_time).do(send_digest)
+
+    logger.info(f"Polling feeds as they come due; digests at {', '.join(DIGEST_TIMES)} daily")
+    poll_due_feeds()
+    if resume:
+        send_digest()
+
     while True:
         schedule.run_pending()
         time.sleep(60)
@@ -197,11 +315,13 @@ def main():
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='RSS Feed Summarizer')
     parser.add_argument('--run-once', action='store_true', help='Run once and exit')
+    parser.add_argument('--resume', action='store_true',
+                        help='Finish and email articles left unfinished by an interrupted run')
     args = parser.parse_args()
     
     if args.run_once:
         logger.info("Running single execution")
-        run_daily()
+        run_daily(resume=args.resume)
     else:
         logger.info("Starting scheduled execution")
-        main()
\ No newline at end of file
+        main(resume=args.resume)
\ No newline at end of file
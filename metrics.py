@@ -0,0 +1,206 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+BYTES_BUCKETS = (1_000, 10_000, 50_000, 100_000, 250_000, 500_000, 1_000_000, 5_000_000)
+
+
+def _label_key(labelnames, labels):
+    return tuple(str(labels.get(name, '')) for name in labelnames)
+
+
+def _format_labels(labelnames, key, extra=None):
+    pairs = list(zip(labelnames, key)) + list(extra or [])
+    if not pairs:
+        return ''
+    escaped = (value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+class Counter:
+    type_name = 'counter'
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def samples(self):
+        with self.lock:
+            return [(self.name, key, value) for key, value in sorted(self.values.items())]
+
+    def to_dict(self):
+        with self.lock:
+            return [dict(zip(self.labelnames, key), value=value) for key, value in sorted(self.values.items())]
+
+
+class Histogram:
+    type_name = 'histogram'
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self.lock:
+            series = self.values.get(key)
+            if series is None:
+                series = self.values[key] = {'counts': [0] * (len(self.buckets) + 1), 'sum': 0.0, 'count': 0}
+            series['counts'][bisect.bisect_left(self.buckets, value)] += 1
+            series['sum'] += value
+            series['count'] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the wall time of a with-block"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        samples = []
+        with self.lock:
+            for key, series in sorted(self.values.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float('inf'),), series['counts']):
+                    cumulative += count
+                    le = '+Inf' if bound == float('inf') else repr(float(bound))
+                    samples.append((f'{self.name}_bucket', key, cumulative, [('le', le)]))
+                samples.append((f'{self.name}_sum', key, series['sum'], None))
+                samples.append((f'{self.name}_count', key, series['count'], None))
+        return samples
+
+    def to_dict(self):
+        with self.lock:
+            return [
+                dict(zip(self.labelnames, key),
+                     count=series['count'],
+                     sum=round(series['sum'], 6),
+                     avg=round(series['sum'] / series['count'], 6) if series['count'] else 0.0)
+                for key, series in sorted(self.values.items())
+            ]
+
+
+class Registry:
+    """Holds every metric of the process and renders them for /metrics or a JSON report"""
+
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+
+    def _register(self, metric):
+        with self.lock:
+            return self.metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._register(Counter(name, help_text, labelnames))
+
+    def histogram(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, help_text, labelnames, buckets))
+
+    def render_prometheus(self):
+        """Render all metrics in the Prometheus text exposition format"""
+        lines = []
+        for metric in self.metrics.values():
+            lines.append(f'# HELP {metric.name} {metric.help_text}')
+            lines.append(f'# TYPE {metric.name} {metric.type_name}')
+            for sample in metric.samples():
+                name, key, value = sample[:3]
+                extra = sample[3] if len(sample) > 3 else None
+                lines.append(f'{name}{_format_labels(metric.labelnames, key, extra)} {value}')
+        return '\n'.join(lines) + '\n'
+
+    def to_dict(self):
+        return {name: metric.to_dict() for name, metric in self.metrics.items()}
+
+
+REGISTRY = Registry()
+
+# Fetching
+FETCH_REQUESTS = REGISTRY.counter('rss_fetch_requests_total', 'HTTP fetches by host and status', ['host', 'kind', 'status'])
+FETCH_BYTES = REGISTRY.counter('rss_fetch_bytes_total', 'Response bytes downloaded by host', ['host', 'kind'])
+FETCH_SECONDS = REGISTRY.histogram('rss_fetch_duration_seconds', 'HTTP fetch latency by host', ['host', 'kind'])
+FETCH_TRUNCATED = REGISTRY.counter('rss_fetch_truncated_total', 'Downloads cut off at the byte cap', ['kind'])
+
+# Extraction
+EXTRACT_SECONDS = REGISTRY.histogram('rss_extract_duration_seconds', 'Article text extraction time', ['backend'])
+EXTRACT_INPUT_BYTES = REGISTRY.histogram('rss_extract_input_bytes', 'Size of HTML pages given to the extractor',
+                                         buckets=BYTES_BUCKETS)
+
+# Clustering
+DUPLICATE_ARTICLES = REGISTRY.counter('rss_duplicate_articles_total', 'Near-duplicate articles folded into another story')
+
+# Summarization
+LLM_REQUESTS = REGISTRY.counter('rss_llm_requests_total', 'OpenAI requests by outcome', ['outcome'])
+LLM_TOKENS = REGISTRY.counter('rss_llm_tokens_total', 'OpenAI tokens used', ['type'])
+LLM_SECONDS = REGISTRY.histogram('rss_llm_latency_seconds', 'OpenAI request latency')
+
+# Caches
+CACHE_LOOKUPS = REGISTRY.counter('rss_cache_lookups_total', 'Cache lookups by cache and result', ['cache', 'result'])
+
+# Email
+EMAIL_SECONDS = REGISTRY.histogram('rss_email_send_duration_seconds', 'Time to send the digest email')
+EMAIL_SENT = REGISTRY.counter('rss_email_sent_total', 'Digest emails by outcome', ['outcome'])
+
+# Whole runs
+RUN_STAGE_SECONDS = REGISTRY.histogram('rss_run_stage_duration_seconds', 'run_daily time per stage', ['stage'],
+                                       buckets=(0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600))
+
+
+# Fields of a to_dict() sample that hold its value rather than a label
+_VALUE_FIELDS = ('value', 'count', 'sum', 'avg')
+
+
+def _series_labels(sample):
+    return tuple((name, value) for name, value in sample.items() if name not in _VALUE_FIELDS)
+
+
+def metrics_since(snapshot):
+    """REGISTRY.to_dict() minus an earlier REGISTRY.to_dict() snapshot, i.e. only what happened since.
+
+    Series that didn't change are left out.
+    """
+    changes = {}
+    for name, samples in REGISTRY.to_dict().items():
+        earlier = {_series_labels(sample): sample for sample in snapshot.get(name, [])}
+        changes[name] = []
+        for sample in samples:
+            base = earlier.get(_series_labels(sample))
+            if base is None:
+                changes[name].append(sample)
+            elif 'value' in sample:
+                if sample['value'] != base['value']:
+                    changes[name].append({**sample, 'value': sample['value'] - base['value']})
+            elif sample['count'] != base['count']:
+                count = sample['count'] - base['count']
+                total = round(sample['sum'] - base['sum'], 6)
+                changes[name].append({**sample, 'count': count, 'sum': total, 'avg': round(total / count, 6)})
+    return changes
+
+
+def cache_hit_ratios(lookups=None):
+    """Hit ratio per cache from the lookup counter samples (by default the process totals)"""
+    totals = {}
+    for sample in CACHE_LOOKUPS.to_dict() if lookups is None else lookups:
+        entry = totals.setdefault(sample['cache'], {'hit': 0, 'miss': 0})
+        entry[sample['result']] = entry.get(sample['result'], 0) + sample['value']
+    return {
+        cache: round(counts['hit'] / (counts['hit'] + counts['miss']), 4) if counts['hit'] + counts['miss'] else 0.0
+        for cache, counts in totals.items()
+    }
@@ -0,0 +1,487 @@
+import json
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timedelta
+
+from clustering import StoryClusterer
+from config import (
+    EXTRACTION_BATCH_SIZE,
+    FETCH_MAX_CONCURRENCY,
+    PIPELINE_QUEUE_SIZE,
+    SUMMARY_MAX_ATTEMPTS,
+    SUMMARY_RETRY_DELAY
+)
+from extraction_pool import get_extraction_pool
+from feed_parser import FeedParser, extract_contents
+from feed_scheduler import FAILED, NOT_MODIFIED, UNCHANGED, UPDATED
+from logger import setup_logger, SAMPLED
+from metrics import DUPLICATE_ARTICLES, RUN_STAGE_SECONDS
+from run_journal import ABANDONED, EMITTED, FETCHED, SUMMARIZED
+
+logger = setup_logger(__name__)
+
+# Marks the end of a stage's input
+_DONE = object()
+
+
+class Stage:
+    """A pool of worker threads reading from one bounded queue and writing to the next.
+
+    handler(item, emit) is called for every input item and may emit any
+    number of outputs. When the input is exhausted and every worker has
+    finished, the end marker is passed on to the next stage. A handler that
+    raises only loses its own item.
+
+    With a batch_size above 1 the handler is called with a list instead: a
+    worker waits for one item, then takes up to batch_size - 1 more that are
+    already queued, so batches grow only while the stage is behind.
+    """
+
+    def __init__(self, name, handler, workers, inbox, outbox=None, batch_size=1):
+        self.name = name
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.batch_size = max(1, batch_size)
+        self.inbox = inbox
+        self.outbox = outbox
+        self.threads = []
+        self.lock = threading.Lock()
+        self.running = self.workers
+        self.items = 0
+        self.errors = 0
+        self.busy = 0.0
+        self.started_at = None
+        self.finished_at = None
+
+    def start(self):
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"{self.name}-{index}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        return self
+
+    def join(self):
+        for thread in self.threads:
+            thread.join()
+
+    @property
+    def elapsed(self):
+        """Wall time from the first item this stage picked up to its last one finishing"""
+        if self.started_at is None:
+            return 0.0
+        return self.finished_at - self.started_at
+
+    def _emit(self, item):
+        if self.outbox is not None:
+            self.outbox.put(item)
+
+    def _take(self):
+        """The next item, or the next batch of up to batch_size items; None once the input is done"""
+        item = self.inbox.get()
+        if item is _DONE:
+            # Let sibling workers see the end marker too
+            self.inbox.put(_DONE)
+            return None
+        if self.batch_size == 1:
+            return item
+
+        batch = [item]
+        while len(batch) < self.batch_size:
+            try:
+                item = self.inbox.get_nowait()
+            except queue.Empty:
+                break
+            if item is _DONE:
+                # Handled by the next _take
+                self.inbox.put(_DONE)
+                break
+            batch.append(item)
+        return batch
+
+    def _work(self):
+        while True:
+            item = self._take()
+            if item is None:
+                break
+
+            start = time.monotonic()
+            with self.lock:
+                if self.started_at is None:
+                    self.started_at = start
+            try:
+                self.handler(item, self._emit)
+                failed = False
+            except Exception as e:
+                logger.error(f"Pipeline stage {self.name} failed on an item: {str(e)}")
+                failed = True
+            with self.lock:
+                self.items += len(item) if self.batch_size > 1 else 1
+                self.errors += failed
+                self.busy += time.monotonic() - start
+
+        with self.lock:
+            self.running -= 1
+            last = self.running == 0
+            if last:
+                self.finished_at = time.monotonic()
+        if last:
+            self._emit(_DONE)
+
+
+def summaries_from_journal(entries):
+    """Rebuild the digest summaries of EMITTED journal entries, with duplicates as related links"""
+    summaries = {}
+    for entry in entries:
+        if entry.get('state') == EMITTED and not entry.get('duplicate_of'):
+            summaries[entry['link']] = Pipeline._with_metadata(entry['feed_url'], entry['article'], entry['summary'])
+    for entry in entries:
+        representative = summaries.get(entry.get('duplicate_of'))
+        if entry.get('state') == EMITTED and representative:
+            representative['related'].append(Pipeline._related(entry['feed_url'], entry['article']))
+    return summaries
+
+
+class SummarySink:
+    """Appends summaries to a JSONL file as they complete, one object per line"""
+
+    def __init__(self, filepath):
+        self.filepath = filepath
+        self.file = None
+        self.count = 0
+
+    def write(self, summary):
+        if self.file is None:
+            os.makedirs(os.path.dirname(self.filepath), exist_ok=True)
+            self.file = open(self.filepath, 'a', encoding='utf-8')
+        record = dict(summary)
+        if hasattr(record.get('published'), 'isoformat'):
+            record['published'] = record['published'].isoformat()
+        self.file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        # Flushed per line so a crash keeps every summary already paid for
+        self.file.flush()
+        self.count += 1
+
+    def close(self):
+        if self.file is not None:
+            os.fsync(self.file.fileno())
+            self.file.close()
+            self.file = None
+
+
+class Pipeline:
+    """Streams a run through feeds -> pages -> extract -> clusters -> summaries -> sink.
+
+    Each stage is a thread pool connected to the next by a bounded queue, so
+    an article is downloaded as soon as its feed is parsed and summarized as
+    soon as its text is extracted, and at most PIPELINE_QUEUE_SIZE items wait
+    between any two stages. Entries are deduplicated against the article
+    cache while their feed is parsed, before any page is downloaded.
+
+    With a parallel extraction pool, the extract stage hands downloaded
+    pages to the worker processes in batches of up to EXTRACTION_BATCH_SIZE;
+    otherwise each page is parsed on its own thread.
+
+    The cluster stage folds near-duplicate articles (the same story from
+    several feeds) into the first one seen; only that representative is
+    summarized, and the others are attached to its summary as 'related'
+    links.
+
+    Successful summaries are recorded in the article cache and appended to
+    the JSONL sink as they complete; run() returns them for the email.
+
+    With a journal, every article's progress is recorded as it goes, and
+    unfinished articles from an interrupted run (journal.pending()) can be
+    passed as resumed: they re-enter the pipeline at the stage after the one
+    they reached instead of being fetched again. An article whose summary
+    fails is retried with a doubling delay (SUMMARY_RETRY_DELAY) and given
+    up on after SUMMARY_MAX_ATTEMPTS runs.
+
+    With a scheduler, the outcome of every feed fetch is recorded with it so
+    the feed's polling interval can adapt.
+    """
+
+    def __init__(self, feed_urls, fetcher, summarizer, cache, feed_cache, sink,
+                 progress=None, queue_size=PIPELINE_QUEUE_SIZE, journal=None, resumed=(), scheduler=None,
+                 extraction_pool=None):
+        self.feed_urls = list(feed_urls)
+        self.fetcher = fetcher
+        self.summarizer = summarizer
+        self.cache = cache
+        self.feed_cache = feed_cache
+        self.sink = sink
+        self.progress = progress
+        self.queue_size = max(1, queue_size)
+        self.journal = journal
+        self.resumed = list(resumed)
+        self.scheduler = scheduler
+        self.extraction_pool = extraction_pool or get_extraction_pool()
+
+        self.lock = threading.Lock()
+        self.seen_links = set()
+        self.counts = {'feeds': 0, 'articles': 0, 'pages': 0, 'extracted': 0, 'summarized': 0}
+        self.summaries = []
+        self.clusterer = StoryClusterer()
+        # Sink state: emitted summaries by link, failed representatives, and
+        # duplicates that arrived before their representative's summary
+        self.emitted = {}
+        self.failed = set()
+        self.waiting_duplicates = {}
+
+    def run(self):
+        """Run every stage to completion; returns (summaries, stage seconds)"""
+        feeds, stubs, pages, articles, clustered, results = (queue.Queue(self.queue_size) for _ in range(6))
+        if self.extraction_pool.parallel:
+            # Two batches in flight: one being parsed while the next one fills up
+            extract = Stage('extract', self._extract_pages, 2, pages, articles, batch_size=EXTRACTION_BATCH_SIZE)
+        else:
+            extract = Stage('extract', self._extract_page, FETCH_MAX_CONCURRENCY, pages, articles)
+        stages = [
+            Stage('feeds', self._process_feed, min(FETCH_MAX_CONCURRENCY, len(self.feed_urls)), feeds, stubs),
+            Stage('pages', self._process_page, FETCH_MAX_CONCURRENCY, stubs, pages),
+            extract,
+            Stage('clusters', self._cluster_article, 1, articles, clustered),
+            Stage('summaries', self._process_article, self.summarizer.max_in_flight, clustered, results),
+            Stage('sink', self._process_result, 1, results)
+        ]
+        for stage in stages:
+            stage.start()
+
+        self._resume(articles, results)
+        logger.info(f"Streaming {len(self.feed_urls)} feeds through the pipeline")
+        for feed_url in self.feed_urls:
+            feeds.put(feed_url)
+        feeds.put(_DONE)
+
+        for stage in stages:
+            stage.join()
+
+        stage_times = {}
+        for stage in stages:
+            stage_times[stage.name] = round(stage.elapsed, 3)
+            RUN_STAGE_SECONDS.observe(stage.elapsed, stage=stage.name)
+            logger.info(f"Stage {stage.name}: {stage.items} items, {stage.errors} errors, "
+                        f"{stage.elapsed:.2f}s wall, {stage.busy:.2f}s busy across {stage.workers} workers")
+        return self.summaries, stage_times
+
+    def _resume(self, articles, results):
+        """Feed unfinished articles from the journal back in after the stage they reached"""
+        if not self.resumed:
+            return
+        logger.info(f"Resuming {len(self.resumed)} unfinished articles from an earlier run")
+        for entry in self.resumed:
+            with self.lock:
+                self.seen_links.add(entry['link'])
+                self.counts['articles'] += 1
+                self.counts['extracted'] += 1
+            if entry['state'] == FETCHED:
+                articles.put((entry['feed_url'], entry['article']))
+            elif entry['state'] == SUMMARIZED:
+                results.put((entry['feed_url'], entry['article'], entry['summary'], None))
+
+        # Already saved and cached; these only still need to be emailed
+        emitted = summaries_from_journal(self.resumed)
+        self.summaries.extend(emitted.values())
+        self.emitted.update(emitted)
+
+    def _record(self, link, state, **data):
+        if self.journal:
+            self.journal.record(link, state, **data)
+
+    def _record_poll(self, feed_url, outcome, published_times=()):
+        if self.scheduler:
+            self.scheduler.record_poll(feed_url, outcome, published_times)
+
+    def _count(self, *counters):
+        with self.lock:
+            for counter in counters:
+                self.counts[counter] += 1
+            return dict(self.counts)
+
+    def _process_feed(self, feed_url, emit):
+        try:
+            result = self.fetcher.fetch(
+                feed_url, headers=self.feed_cache.conditional_headers(feed_url), kind='feed'
+            )
+        finally:
+            counts = self._count('feeds')
+            if self.progress:
+                self.progress.update('feeds_fetched', counts['feeds'], len(self.feed_urls))
+
+        if result['status'] == 304:
+            logger.info("Feed not modified since last run: %s", feed_url, extra=SAMPLED)
+            self._record_poll(feed_url, NOT_MODIFIED)
+            return
+        if result['status'] != 200:
+            logger.error(f"Failed to fetch feed: {feed_url}, status: {result['status'] or result['error']}")
+            self._record_poll(feed_url, FAILED)
+            return
+
+        parser = FeedParser(feed_url, feed_cache=self.feed_cache, extraction_pool=self.extraction_pool)
+        if parser.is_unchanged(result['text'], result['headers']):
+            self._record_poll(feed_url, UNCHANGED)
+            return
+
+        stubs = parser.parse_entries(result['text'])
+        self._record_poll(feed_url, UPDATED, parser.published_times)
+        if not stubs:
+            logger.warning(f"No articles found in {feed_url}")
+            return
+
+        # Drop already processed links before any article page is downloaded
+        new_stubs = []
+        for stub in stubs:
+            if self.cache.is_processed(stub['link']):
+                continue
+            if self.journal and self.journal.waiting(stub['link']):
+                # Retried from the journal once its delay is up
+                continue
+            with self.lock:
+                if stub['link'] in self.seen_links:
+                    continue
+                self.seen_links.add(stub['link'])
+                self.counts['articles'] += 1
+            new_stubs.append(stub)
+        logger.info("Found %d new of %d articles in %s", len(new_stubs), len(stubs), feed_url, extra=SAMPLED)
+
+        for stub in new_stubs:
+            emit((feed_url, parser, stub))
+
+    def _process_page(self, item, emit):
+        feed_url, parser, stub = item
+        html = ''
+        try:
+            page = self.fetcher.fetch(stub['link'], kind='page')
+            if page['status'] == 200:
+                html = page['text'] or ''
+        finally:
+            self._count('pages')
+            # A failed download still goes on, to fall back to the feed summary
+            emit((feed_url, parser, stub, html))
+
+    def _extract_page(self, item, emit):
+        feed_url, parser, stub, html = item
+        self._emit_article(feed_url, parser.extract_article_text(stub, html=html), emit)
+
+    def _extract_pages(self, batch, emit):
+        """Extract a batch of downloaded pages in one round trip to the worker processes"""
+        downloaded = [html for _, _, _, html in batch if html]
+        try:
+            texts = iter(extract_contents(downloaded, self.extraction_pool))
+        except Exception as e:
+            logger.warning(f"Batch extraction of {len(downloaded)} pages failed, extracting one by one: {str(e)}")
+            for item in batch:
+                self._extract_page(item, emit)
+            return
+
+        for feed_url, parser, stub, html in batch:
+            text = next(texts) if html else None
+            self._emit_article(feed_url, parser.build_article(stub, text), emit)
+
+    def _emit_article(self, feed_url, article, emit):
+        counts = self._count('extracted') if article else self._count()
+        if self.progress:
+            self.progress.update('articles_extracted', counts['extracted'], counts['articles'])
+        if article:
+            self._record(article['link'], FETCHED, feed_url=feed_url, article=article)
+            emit((feed_url, article))
+
+    def _cluster_article(self, item, emit):
+        feed_url, article = item
+        duplicate_of = self.clusterer.assign(article['link'], article['text'])
+        if duplicate_of:
+            DUPLICATE_ARTICLES.inc()
+            logger.info("%s is a near duplicate of %s; not summarizing it", article['link'], duplicate_of, extra=SAMPLED)
+        emit((feed_url, article, duplicate_of))
+
+    def _process_article(self, item, emit):
+        feed_url, article, duplicate_of = item
+        summary = None
+        try:
+            if not duplicate_of:
+                summary = self.summarizer.summarize(article['text'])
+        finally:
+            counts = self._count('summarized')
+            if self.progress:
+                self.progress.update('summaries_done', counts['summarized'], counts['extracted'])
+        if summary:
+            self._record(article['link'], SUMMARIZED, summary=summary)
+        emit((feed_url, article, summary, duplicate_of))
+
+    def _process_result(self, item, emit):
+        feed_url, article, summary, duplicate_of = item
+        if duplicate_of:
+            self._attach_duplicate(feed_url, article, duplicate_of)
+            return
+
+        if not summary:
+            self._retry_later(feed_url, article)
+            self.failed.add(article['link'])
+            for duplicate_feed_url, duplicate in self.waiting_duplicates.pop(article['link'], []):
+                self._drop_duplicate(duplicate_feed_url, duplicate, article['link'])
+            return
+
+        summary_with_metadata = self._with_metadata(feed_url, article, summary)
+        # Only mark the article processed once its summary is safely written
+        self.sink.write(summary_with_metadata)
+        self.cache.add_article(article['link'])
+        self._record(article['link'], EMITTED)
+        self.summaries.append(summary_with_metadata)
+        self.emitted[article['link']] = summary_with_metadata
+
+        for duplicate_feed_url, duplicate in self.waiting_duplicates.pop(article['link'], []):
+            self._attach_duplicate(duplicate_feed_url, duplicate, article['link'])
+
+    def _attach_duplicate(self, feed_url, article, duplicate_of):
+        """Add a duplicate to its representative's related links once that has been summarized"""
+        representative = self.emitted.get(duplicate_of)
+        if representative is None:
+            if duplicate_of in self.failed:
+                self._drop_duplicate(feed_url, article, duplicate_of)
+            else:
+                self.waiting_duplicates.setdefault(duplicate_of, []).append((feed_url, article))
+            return
+
+        related = self._related(feed_url, article)
+        self.sink.write({**related, 'published': article['published'], 'duplicate_of': duplicate_of})
+        self.cache.add_article(article['link'])
+        representative['related'].append(related)
+        self._record(article['link'], EMITTED, duplicate_of=duplicate_of)
+
+    def _retry_later(self, feed_url, article):
+        """Schedule another attempt at a failed summary, or give up after SUMMARY_MAX_ATTEMPTS"""
+        link = article['link']
+        attempts = (self.journal.attempts(link) if self.journal else 0) + 1
+        if attempts >= SUMMARY_MAX_ATTEMPTS:
+            logger.error(f"Giving up on {link} after {attempts} failed summaries")
+            # Cached so it isn't fetched again
+            self.cache.add_article(link)
+            self._record(link, ABANDONED, attempts=attempts)
+            return
+
+        # Make sure the feed is parsed again so the article is retried even without a journal
+        self.feed_cache.invalidate(feed_url)
+        retry_at = datetime.now() + timedelta(seconds=SUMMARY_RETRY_DELAY * 2 ** (attempts - 1))
+        self._record(link, FETCHED, attempts=attempts, retry_at=retry_at.isoformat())
+
+    def _drop_duplicate(self, feed_url, article, duplicate_of):
+        """Leave a duplicate of a failed representative to be clustered again next run"""
+        logger.info("Not emitting %s: %s was not summarized", article['link'], duplicate_of, extra=SAMPLED)
+        # It stays uncached; make sure its own feed is parsed again too
+        self.feed_cache.invalidate(feed_url)
+
+    @staticmethod
+    def _related(feed_url, article):
+        return {'title': article['title'], 'link': article['link'], 'source': feed_url}
+
+    @staticmethod
+    def _with_metadata(feed_url, article, summary):
+        return {
+            'title': article['title'],
+            'link': article['link'],
+            'published': article['published'],
+            'source': feed_url,
+            **summary,  # Unpack the summary and category
+            'related': []
+        }
@@ -0,0 +1,124 @@
+import os
+from datetime import datetime
+import json
+import threading
+from pathlib import Path
+from storage import atomic_write_lines
+from logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Article states, in the order a run moves through them
+FETCHED = 'fetched'        # text extracted, not summarized yet
+SUMMARIZED = 'summarized'  # summary generated, not saved yet
+EMITTED = 'emitted'        # saved to the summaries file and article cache, not emailed yet
+EMAILED = 'emailed'        # done; dropped when the journal is compacted
+ABANDONED = 'abandoned'    # summarizing failed too often; dropped when the journal is compacted
+
+
+class RunJournal:
+    """Append-only log of where every article of a run got to.
+
+    Each state change is one JSON line, flushed as it is written, so if the
+    process is killed mid-run the journal still says which articles were
+    extracted, summarized or saved but never emailed. A resumed run picks
+    those up from their last state instead of fetching them again or
+    dropping them. An article whose summary failed stays FETCHED with its
+    attempts and the time of its next retry (retry_at). Emailed and
+    abandoned articles are removed by compact().
+    """
+
+    def __init__(self, journal_file='articles/runs/journal.jsonl'):
+        # Use absolute paths
+        base_dir = os.environ.get('STORAGE_PATH', '/app/articles')
+        self.journal_file = Path(base_dir) / 'runs' / 'journal.jsonl'
+
+        # Create directories
+        os.makedirs(self.journal_file.parent, exist_ok=True)
+
+        self.lock = threading.Lock()
+        self.entries = self._load()
+        self.file = open(self.journal_file, 'a', encoding='utf-8')
+        if self.entries:
+            logger.info(f"Loaded run journal with {len(self.pending())} unfinished articles from {self.journal_file}")
+
+    def _load(self):
+        """Replay the journal into the latest state of every article"""
+        entries = {}
+        if not self.journal_file.exists():
+            return entries
+        with open(self.journal_file, 'r', encoding='utf-8') as f:
+            for line_number, line in enumerate(f, 1):
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # A run killed mid-write leaves a partial last line
+                    logger.warning(f"Skipping unreadable line {line_number} of {self.journal_file}")
+                    continue
+                entry = entries.setdefault(record['link'], {})
+                entry.update(record)
+        for entry in entries.values():
+            published = (entry.get('article') or {}).get('published')
+            if isinstance(published, str):
+                entry['article']['published'] = datetime.fromisoformat(published)
+        return entries
+
+    def record(self, link, state, **data):
+        """Record that an article reached a state, with any data needed to resume from it"""
+        record = {'link': link, 'state': state, 'at': datetime.now().isoformat(), **data}
+        line = json.dumps(record, default=_to_json, ensure_ascii=False)
+        with self.lock:
+            self.entries.setdefault(link, {}).update(record)
+            self.file.write(line + '\n')
+            self.file.flush()
+
+    def pending(self, states=(FETCHED, SUMMARIZED, EMITTED), due=False):
+        """Articles an earlier run left unfinished, as dicts with link, state, feed_url, article and summary.
+
+        With due, articles still waiting to retry a failed summary are left out.
+        """
+        now = datetime.now()
+        with self.lock:
+            return [
+                dict(entry) for entry in self.entries.values()
+                if entry.get('state') in states and not (due and _waiting(entry, now))
+            ]
+
+    def attempts(self, link):
+        """How many runs have failed to summarize an article"""
+        with self.lock:
+            return self.entries.get(link, {}).get('attempts', 0)
+
+    def waiting(self, link):
+        """Whether an article is waiting to retry a failed summary"""
+        with self.lock:
+            entry = self.entries.get(link)
+            return bool(entry) and entry.get('state') == FETCHED and _waiting(entry, datetime.now())
+
+    def compact(self):
+        """Rewrite the journal with only the unfinished articles"""
+        with self.lock:
+            self.entries = {
+                link: entry for link, entry in self.entries.items() if entry.get('state') not in (EMAILED, ABANDONED)
+            }
+            self.file.close()
+            atomic_write_lines(
+                self.journal_file,
+                (json.dumps(entry, default=_to_json, ensure_ascii=False) for entry in self.entries.values())
+            )
+            self.file = open(self.journal_file, 'a', encoding='utf-8')
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+
+
+def _waiting(entry, now):
+    retry_at = entry.get('retry_at')
+    return bool(retry_at) and datetime.fromisoformat(retry_at) > now
+
+
+def _to_json(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
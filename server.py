@@ -1,6 +1,9 @@
-from flask import Flask, jsonify
+from flask import Flask, Response, jsonify
+import multiprocessing
 import threading
-from main import run_daily
+from config import WARMUP_ON_START
+from jobs import RunQueue
+from metrics import REGISTRY
 import os
 import traceback
 from logger import setup_logger
@@ -8,6 +11,27 @@ from logger import setup_logger
 app = Flask(__name__)
 logger = setup_logger(__name__)
 
+# main pulls in openai, feedparser, bs4 and jinja2, so it is only imported
+# when a run or warm-up needs it; the health check answers without it
+
+def run_resumed(progress=None):
+    # A killed container loses its in-flight run, so every triggered run
+    # first finishes whatever the previous one left in the run journal
+    from main import run_daily
+    run_daily(progress=progress, resume=True)
+
+def warm_up():
+    from main import warm_up
+    return warm_up()
+
+run_queue = RunQueue(run_resumed)
+
+# Extraction workers re-import this module (named, but before parent_process()
+# is set); only the serving process warms up
+if WARMUP_ON_START and multiprocessing.current_process().name == 'MainProcess':
+    # Warm up while the instance waits for its first request
+    threading.Thread(target=warm_up, name='warmup', daemon=True).start()
+
 @app.route('/', methods=['GET'])
 def health_check():
     try:
@@ -41,11 +65,17 @@ def trigger_run():
         else:
             logger.error("/app/config directory not found")
         
-        run_daily()
-        logger.info("Run completed successfully")
-        return jsonify({'status': 'success', 'message': 'RSS summarizer run completed'}), 200
+        # Runs happen on a background worker; the caller polls /runs/<job_id>
+        job, merged = run_queue.submit()
+        return jsonify({
+            'status': 'queued',
+            'job_id': job['id'],
+            'merged': merged,
+            'message': 'Merged into already queued run' if merged else 'RSS summarizer run queued',
+            'status_url': f"/runs/{job['id']}"
+        }), 202
     except Exception as e:
-        error_msg = f"Error during run: {str(e)}\n{traceback.format_exc()}"
+        error_msg = f"Error queueing run: {str(e)}\n{traceback.format_exc()}"
         logger.error(error_msg)
         return jsonify({
             'status': 'error',
@@ -53,6 +83,27 @@ def trigger_run():
             'traceback': traceback.format_exc()
         }), 500
 
+@app.route('/runs/<job_id>', methods=['GET'])
+def run_status(job_id):
+    job = run_queue.get(job_id)
+    if job is None:
+        return jsonify({'status': 'error', 'message': f'Unknown run {job_id}'}), 404
+    return jsonify(job), 200
+
+@app.route('/warmup', methods=['GET'])
+def warmup():
+    """Load the run dependencies now, e.g. from a startup probe, instead of on the first run"""
+    try:
+        elapsed = warm_up()
+        return jsonify({'status': 'warm', 'seconds': round(elapsed, 3)}), 200
+    except Exception as e:
+        logger.error(f"Warm-up failed: {str(e)}")
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    return Response(REGISTRY.render_prometheus(), mimetype='text/plain; version=0.0.4')
+
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 8080))
     app.run(host='0.0.0.0', port=port) 
\ No newline at end of file
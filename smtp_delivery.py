@@ -0,0 +1,225 @@
+import queue
+import random
+import smtplib
+import ssl
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from config import (
+    SMTP_SERVER,
+    SMTP_PORT,
+    SMTP_USE_SSL,
+    SMTP_BATCH_SIZE,
+    SMTP_MAX_CONNECTIONS,
+    SMTP_MAX_RETRIES,
+    SMTP_BACKOFF_BASE,
+    SMTP_TIMEOUT
+)
+from logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Connections idle for longer than this are checked with NOOP before reuse
+IDLE_CHECK_AFTER = 30  # seconds
+
+
+def is_transient(code):
+    """4xx replies mean "try again later"; 5xx replies are permanent"""
+    return 400 <= code < 500
+
+
+def _reply_text(code, message):
+    if isinstance(message, bytes):
+        message = message.decode('utf-8', errors='replace')
+    return f"{code} {message}"
+
+
+class SMTPConnectionPool:
+    """Keeps up to size authenticated SMTP connections open for reuse.
+
+    A connection is only logged into once and then goes back to the pool
+    after every message, so a digest split into many batches pays for the
+    TLS handshake and AUTH at most size times. Connections that fail at the
+    socket level are dropped; those that only got an error reply are kept.
+    """
+
+    def __init__(self, host=SMTP_SERVER, port=SMTP_PORT, username=None, password=None,
+                 use_ssl=SMTP_USE_SSL, size=SMTP_MAX_CONNECTIONS, timeout=SMTP_TIMEOUT):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_ssl = use_ssl
+        self.size = max(1, size)
+        self.timeout = timeout
+        self.slots = threading.BoundedSemaphore(self.size)
+        self.idle = queue.LifoQueue()
+        self.opened = 0
+
+    def _connect(self):
+        """Open a connection, upgrading it with STARTTLS when it isn't SSL already and the server offers it.
+
+        Logs in only if the server offers AUTH, and never over an unencrypted connection.
+        """
+        smtp_class = smtplib.SMTP_SSL if self.use_ssl else smtplib.SMTP
+        server = smtp_class(self.host, self.port, timeout=self.timeout)
+        server.ehlo()
+        encrypted = self.use_ssl
+        if not encrypted and server.has_extn('starttls'):
+            server.starttls(context=ssl.create_default_context())
+            server.ehlo()
+            encrypted = True
+        if self.password and server.has_extn('auth'):
+            if not encrypted:
+                self._discard(server)
+                raise smtplib.SMTPNotSupportedError(
+                    f"{self.host}:{self.port} offers neither SSL nor STARTTLS; not sending credentials in cleartext"
+                )
+            server.login(self.username, self.password)
+        elif self.password:
+            logger.info(f"{self.host}:{self.port} doesn't offer AUTH; sending without logging in")
+        self.opened += 1
+        logger.debug(f"Opened SMTP connection to {self.host}:{self.port}")
+        return server
+
+    def _checkout(self):
+        while True:
+            try:
+                server, last_used = self.idle.get_nowait()
+            except queue.Empty:
+                return self._connect()
+            if time.monotonic() - last_used < IDLE_CHECK_AFTER:
+                return server
+            try:
+                if server.noop()[0] == 250:
+                    return server
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._discard(server)
+
+    @staticmethod
+    def _discard(server):
+        try:
+            server.close()
+        except Exception:
+            pass
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection for one transaction"""
+        with self.slots:
+            server = self._checkout()
+            try:
+                yield server
+            except (smtplib.SMTPResponseException, smtplib.SMTPRecipientsRefused):
+                # The server answered, so the session is still usable
+                self.idle.put((server, time.monotonic()))
+                raise
+            except BaseException:
+                self._discard(server)
+                raise
+            self.idle.put((server, time.monotonic()))
+
+    def close(self):
+        """QUIT every idle connection"""
+        while True:
+            try:
+                server, _ = self.idle.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                server.quit()
+            except Exception:
+                self._discard(server)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class SMTPDelivery:
+    """Sends messages to recipient lists in batches over a connection pool.
+
+    Each message goes out in envelopes of at most batch_size recipients (the
+    recipients never appear in the headers, like BCC), and all batches of all
+    messages are sent concurrently, one per pooled connection. Transient 4xx
+    replies and dropped connections are retried with jittered backoff; only
+    the recipients that are still pending are retried.
+    """
+
+    def __init__(self, pool, batch_size=SMTP_BATCH_SIZE, max_retries=SMTP_MAX_RETRIES):
+        self.pool = pool
+        self.batch_size = max(1, batch_size)
+        self.max_retries = max(0, max_retries)
+
+    def send(self, deliveries):
+        """Send (message, recipients) pairs; returns {'sent': [...], 'failed': {recipient: reason}}"""
+        batches = []
+        for message, recipients in deliveries:
+            recipients = list(dict.fromkeys(r for r in recipients if r))
+            data = message.as_string()
+            for i in range(0, len(recipients), self.batch_size):
+                batches.append((message['From'], data, recipients[i:i + self.batch_size]))
+
+        result = {'sent': [], 'failed': {}}
+        if not batches:
+            return result
+
+        start = time.monotonic()
+        with ThreadPoolExecutor(max_workers=min(self.pool.size, len(batches)), thread_name_prefix='smtp') as executor:
+            for sent, failed in executor.map(self._send_batch, batches):
+                result['sent'].extend(sent)
+                result['failed'].update(failed)
+        logger.info(f"Delivered {len(batches)} batches to {len(result['sent'])} recipients "
+                    f"({len(result['failed'])} failed) over {self.pool.opened} connections "
+                    f"in {time.monotonic() - start:.2f}s")
+        return result
+
+    def _send_batch(self, batch):
+        sender, data, pending = batch
+        sent, failed = [], {}
+
+        for attempt in range(self.max_retries + 1):
+            last_attempt = attempt == self.max_retries
+            try:
+                with self.pool.connection() as server:
+                    refused = server.sendmail(sender, pending, data)
+            except smtplib.SMTPRecipientsRefused as e:
+                refused = e.recipients
+            except smtplib.SMTPResponseException as e:
+                if is_transient(e.smtp_code) and not last_attempt:
+                    self._wait(attempt, _reply_text(e.smtp_code, e.smtp_error))
+                    continue
+                failed.update((r, _reply_text(e.smtp_code, e.smtp_error)) for r in pending)
+                break
+            except (smtplib.SMTPException, OSError) as e:
+                if not last_attempt:
+                    self._wait(attempt, str(e))
+                    continue
+                failed.update((r, str(e)) for r in pending)
+                break
+
+            sent.extend(r for r in pending if r not in refused)
+            pending = []
+            for recipient, (code, message) in refused.items():
+                if is_transient(code) and not last_attempt:
+                    pending.append(recipient)
+                else:
+                    failed[recipient] = _reply_text(code, message)
+            if not pending:
+                break
+            self._wait(attempt, f"{len(pending)} recipients deferred")
+
+        for recipient, reason in failed.items():
+            logger.error(f"Could not deliver to {recipient}: {reason}")
+        return sent, failed
+
+    @staticmethod
+    def _wait(attempt, reason):
+        delay = random.uniform(0, SMTP_BACKOFF_BASE * 2 ** attempt)
+        logger.warning(f"Transient SMTP failure ({reason}), retrying in {delay:.1f}s")
+        time.sleep(delay)
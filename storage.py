@@ -0,0 +1,68 @@
+import os
+from datetime import datetime
+import json
+import tempfile
+from pathlib import Path
+from logger import setup_logger
+
+logger = setup_logger(__name__)
+
+def atomic_write_json(filename, data, **dump_kwargs):
+    """Write JSON so readers only ever see the old or the new file, never a partial one.
+
+    Data goes to a temp file in the same directory, which is fsynced and then
+    renamed over the target.
+    """
+    _atomic_write(filename, lambda f: json.dump(data, f, **dump_kwargs))
+
+
+def atomic_write_lines(filename, lines):
+    """Atomically replace a text file with the given lines (newlines are added)"""
+    _atomic_write(filename, lambda f: f.writelines(f"{line}\n" for line in lines))
+
+
+def _atomic_write(filename, write):
+    filename = Path(filename)
+    fd, tmp_path = tempfile.mkstemp(dir=filename.parent, prefix=f".{filename.name}.", suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, filename)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+
+    # Persist the rename itself
+    try:
+        dir_fd = os.open(filename.parent, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(dir_fd)
+    except OSError:
+        pass
+    finally:
+        os.close(dir_fd)
+
+
+def load_json(filename, default):
+    """Load a JSON file, returning default if it is missing.
+
+    A corrupt file is moved aside (not silently replaced) and logged as an
+    error, so the damage is visible and the original bytes are kept.
+    """
+    if not os.path.exists(filename):
+        return default
+    try:
+        with open(filename, 'r') as f:
+            return json.load(f)
+    except json.JSONDecodeError as e:
+        corrupt_name = f"{filename}.corrupt-{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        os.replace(filename, corrupt_name)
+        logger.error(f"Corrupt JSON in {filename} ({e}), moved it to {corrupt_name}")
+        return default
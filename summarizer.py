@@ -1,39 +1,235 @@
+import functools
 import json
-from openai import OpenAI
-from config import OPENAI_API_KEY, SYSTEM_PROMPT, SUMMARY_PROMPT
-from logger import setup_logger
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from config import (
+    OPENAI_API_KEY,
+    OPENAI_BASE_URL,
+    SUMMARY_MODEL,
+    SUMMARY_MAX_TOKENS,
+    SUMMARY_MAX_IN_FLIGHT,
+    SUMMARY_REQUESTS_PER_MINUTE,
+    SUMMARY_TOKENS_PER_MINUTE,
+    SUMMARY_MAX_RETRIES,
+    SUMMARY_BACKOFF_BASE,
+    SUMMARY_BACKOFF_MAX,
+    SYSTEM_PROMPT,
+    SUMMARY_PROMPT
+)
+from logger import setup_logger, SAMPLED
+from metrics import LLM_REQUESTS, LLM_SECONDS, LLM_TOKENS
+from summary_cache import SummaryCache
+from text_budget import fit_to_budget, get_token_counter
 
 logger = setup_logger(__name__)
 
+
+@functools.lru_cache(maxsize=None)
+def retryable_errors():
+    """Errors worth retrying; anything else (bad request, auth) fails immediately"""
+    import openai
+    return (
+        openai.RateLimitError,
+        openai.APIConnectionError,
+        openai.APITimeoutError,
+        openai.InternalServerError
+    )
+
+class RateLimiter:
+    """Thread-safe token buckets for a requests-per-minute and a tokens-per-minute budget"""
+
+    def __init__(self, requests_per_minute, tokens_per_minute):
+        self.request_capacity = float(requests_per_minute)
+        self.token_capacity = float(tokens_per_minute)
+        self.request_budget = self.request_capacity
+        self.token_budget = self.token_capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self.updated
+        self.updated = now
+        self.request_budget = min(self.request_capacity,
+                                  self.request_budget + elapsed * self.request_capacity / 60)
+        self.token_budget = min(self.token_capacity,
+                                self.token_budget + elapsed * self.token_capacity / 60)
+
+    def acquire(self, tokens):
+        """Block until one request and `tokens` tokens fit in the budget, then spend them"""
+        tokens = min(tokens, self.token_capacity)
+        while True:
+            with self.lock:
+                self._refill()
+                if self.request_budget >= 1 and self.token_budget >= tokens:
+                    self.request_budget -= 1
+                    self.token_budget -= tokens
+                    return
+                wait = max(
+                    (1 - self.request_budget) * 60 / self.request_capacity,
+                    (tokens - self.token_budget) * 60 / self.token_capacity
+                )
+            time.sleep(wait)
+
+
 class Summarizer:
-    def __init__(self):
-        self.client = OpenAI(api_key=OPENAI_API_KEY)
+    def __init__(self, cache=None, max_in_flight=SUMMARY_MAX_IN_FLIGHT, client=None):
+        self.cache = cache if cache is not None else SummaryCache()
+        self.max_in_flight = max(1, max_in_flight)
+        self.rate_limiter = RateLimiter(SUMMARY_REQUESTS_PER_MINUTE, SUMMARY_TOKENS_PER_MINUTE)
+        # The OpenAI client and tokenizer are only loaded once there is
+        # something to summarize, so runs with no new articles skip them
+        self._client = client
+        self._client_lock = threading.Lock()
+        self._prompt_tokens = None
+        self.input_tokens = 0
+        self.tokens_saved = 0
+        self.stats_lock = threading.Lock()
         logger.info("Initialized Summarizer")
 
+    @property
+    def client(self):
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    from openai import OpenAI
+                    # Retries are handled here so they go through the rate limiter
+                    self._client = OpenAI(api_key=OPENAI_API_KEY, base_url=OPENAI_BASE_URL, max_retries=0)
+        return self._client
+
+    @property
+    def token_counter(self):
+        return get_token_counter()
+
+    @property
+    def prompt_tokens(self):
+        if self._prompt_tokens is None:
+            self._prompt_tokens = self.token_counter.count(SYSTEM_PROMPT) + self.token_counter.count(SUMMARY_PROMPT)
+        return self._prompt_tokens
+
+    def prepare_text(self, text):
+        """Trim article text to the input token budget and record the tokens saved"""
+        prepared, original_tokens, kept_tokens = fit_to_budget(text, counter=self.token_counter)
+        saved = original_tokens - kept_tokens
+        with self.stats_lock:
+            self.input_tokens += kept_tokens
+            self.tokens_saved += max(saved, 0)
+        if saved > 0:
+            logger.info("Trimmed article input from %d to %d tokens (%d saved)",
+                        original_tokens, kept_tokens, saved, extra=SAMPLED)
+        return prepared
+
     def summarize(self, text):
-        logger.debug(f"Starting summarization of text (length: {len(text)})")
+        text = self.prepare_text(text)
+        cached = self.cache.get(text)
+        if cached:
+            logger.debug("Using cached summary for text (length: %d)", len(text))
+            return cached
+
+        logger.debug("Starting summarization of text (length: %d)", len(text))
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {"role": "system", "content": SYSTEM_PROMPT},
-                    {"role": "user", "content": f"{SUMMARY_PROMPT}\n\n{text}"}
-                ],
-                max_tokens=250,
-                temperature=0.5,
-                response_format={"type": "json_object"}
-            )
-            
+            response = self._create_completion(text)
+
             try:
                 result = json.loads(response.choices[0].message.content)
                 if not isinstance(result, dict) or 'summary' not in result or 'category' not in result:
                     raise ValueError("Invalid response format")
-                logger.debug(f"Successfully generated summary and category: {result['category']}")
+                logger.debug("Successfully generated summary and category: %s", result['category'])
+                self.cache.put(text, result)
                 return result
             except json.JSONDecodeError as e:
                 logger.error(f"Failed to parse AI response as JSON: {e}")
                 return None
-                
+
         except Exception as e:
             logger.error(f"Error in summarization: {str(e)}")
-            return None
\ No newline at end of file
+            return None
+
+    def summarize_many(self, texts, on_progress=None):
+        """Summarize texts concurrently and return results (or None) in input order.
+
+        At most max_in_flight requests run at once, and every request waits
+        for room in the requests/tokens per minute budget. Identical texts in
+        the batch are only sent once. on_progress(done, total) is called as
+        unique texts finish.
+        """
+        texts = list(texts)
+        unique = {}
+        for text in texts:
+            unique.setdefault(self.cache.make_key(text), text)
+
+        if not unique:
+            return []
+
+        logger.info(f"Summarizing {len(texts)} articles ({len(unique)} unique) with up to {self.max_in_flight} in flight")
+        start = time.monotonic()
+        results = {}
+        with ThreadPoolExecutor(max_workers=min(self.max_in_flight, len(unique))) as executor:
+            futures = {executor.submit(self.summarize, text): key for key, text in unique.items()}
+            for future in as_completed(futures):
+                results[futures[future]] = future.result()
+                if on_progress:
+                    on_progress(len(results), len(unique))
+        logger.info(f"Summarized {len(unique)} articles in {time.monotonic() - start:.2f}s")
+
+        return [results[self.cache.make_key(text)] for text in texts]
+
+    def _create_completion(self, text):
+        """Call the chat completions API, retrying rate limits and transient errors with backoff"""
+        content = f"{SUMMARY_PROMPT}\n\n{text}"
+        estimated_tokens = self.prompt_tokens + self.token_counter.count(text) + SUMMARY_MAX_TOKENS
+
+        for attempt in range(SUMMARY_MAX_RETRIES + 1):
+            self.rate_limiter.acquire(estimated_tokens)
+            start = time.perf_counter()
+            try:
+                response = self.client.chat.completions.create(
+                    model=SUMMARY_MODEL,
+                    messages=[
+                        {"role": "system", "content": SYSTEM_PROMPT},
+                        {"role": "user", "content": content}
+                    ],
+                    max_tokens=SUMMARY_MAX_TOKENS,
+                    temperature=0.5,
+                    response_format={"type": "json_object"}
+                )
+                LLM_SECONDS.observe(time.perf_counter() - start)
+                LLM_REQUESTS.inc(outcome='success')
+                if response.usage:
+                    LLM_TOKENS.inc(response.usage.prompt_tokens, type='prompt')
+                    LLM_TOKENS.inc(response.usage.completion_tokens, type='completion')
+                return response
+            except retryable_errors() as e:
+                LLM_SECONDS.observe(time.perf_counter() - start)
+                if attempt == SUMMARY_MAX_RETRIES:
+                    LLM_REQUESTS.inc(outcome='error')
+                    raise
+                LLM_REQUESTS.inc(outcome='retry')
+                delay = self._retry_delay(e, attempt)
+                logger.warning(f"{type(e).__name__} from OpenAI, retrying in {delay:.1f}s "
+                               f"(attempt {attempt + 1}/{SUMMARY_MAX_RETRIES})")
+                time.sleep(delay)
+
+    @staticmethod
+    def _retry_delay(error, attempt):
+        """Honour Retry-After when the API sends it, otherwise use jittered exponential backoff"""
+        response = getattr(error, 'response', None)
+        if response is not None:
+            try:
+                return min(float(response.headers.get('retry-after')), SUMMARY_BACKOFF_MAX)
+            except (TypeError, ValueError):
+                pass
+        return random.uniform(0, min(SUMMARY_BACKOFF_MAX, SUMMARY_BACKOFF_BASE * 2 ** attempt))
+
+    def save_cache(self):
+        """Persist the summary cache and log what caching and trimming saved this run"""
+        self.cache.save()
+        lookups = self.cache.hits + self.cache.misses
+        if lookups:
+            logger.info(f"Summary cache: {self.cache.hits}/{lookups} hits ({(self.cache.hits/lookups)*100:.1f}%)")
+        original = self.input_tokens + self.tokens_saved
+        if original:
+            logger.info(f"Article input tokens: {self.input_tokens} kept, {self.tokens_saved} saved "
+                        f"({(self.tokens_saved/original)*100:.1f}%)")
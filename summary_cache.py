@@ -0,0 +1,88 @@
+import os
+from collections import OrderedDict
+import hashlib
+import re
+import threading
+import unicodedata
+from pathlib import Path
+
+from config import SUMMARY_MODEL, PROMPT_VERSION, SUMMARY_CACHE_MAX_ENTRIES
+from metrics import CACHE_LOOKUPS
+from storage import atomic_write_json, load_json
+from logger import setup_logger
+
+logger = setup_logger(__name__)
+
+class SummaryCache:
+    """Persistent LRU cache of summaries keyed by a hash of the normalized article text.
+
+    Keys also include the model and prompt version, so changing either
+    never serves a summary produced under the old settings. Texts that are
+    empty once normalized (failed extractions) are never cached, since they
+    would all share one key.
+    """
+
+    def __init__(self, max_entries=SUMMARY_CACHE_MAX_ENTRIES, model=SUMMARY_MODEL):
+        # Use absolute paths
+        base_dir = os.environ.get('STORAGE_PATH', '/app/articles')
+        self.cache_file = Path(base_dir) / 'processed' / 'summary_cache.json'
+        self.max_entries = max_entries
+        self.model = model
+        self.hits = 0
+        self.misses = 0
+        self.dirty = False
+        self.lock = threading.Lock()
+
+        # Create directories
+        os.makedirs(self.cache_file.parent, exist_ok=True)
+
+        # Stored in least- to most-recently used order
+        self.entries = OrderedDict(load_json(self.cache_file, {}))
+        logger.info(f"Loaded {len(self.entries)} cached summaries from {self.cache_file}")
+
+    def save(self):
+        """Save cache to file atomically if anything changed since it was loaded"""
+        with self.lock:
+            if not self.dirty:
+                return
+            atomic_write_json(self.cache_file, self.entries)
+            self.dirty = False
+
+    @staticmethod
+    def normalize(text):
+        """Normalize unicode, case and whitespace so trivially different copies hash the same"""
+        text = unicodedata.normalize('NFKC', text or '')
+        return re.sub(r'\s+', ' ', text).strip().lower()
+
+    def make_key(self, text):
+        material = f"{self.model}\0{PROMPT_VERSION}\0{self.normalize(text)}"
+        return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+    def get(self, text):
+        """Return a copy of the cached {summary, category} for text, or None"""
+        if not self.normalize(text):
+            return None
+        key = self.make_key(text)
+        with self.lock:
+            result = self.entries.get(key)
+            if result is None:
+                self.misses += 1
+                CACHE_LOOKUPS.inc(cache='summary', result='miss')
+                return None
+            self.hits += 1
+            CACHE_LOOKUPS.inc(cache='summary', result='hit')
+            self.entries.move_to_end(key)
+            self.dirty = True
+            return dict(result)
+
+    def put(self, text, result):
+        """Store a summary result, evicting the least recently used entries over the limit"""
+        if not self.normalize(text):
+            return
+        key = self.make_key(text)
+        with self.lock:
+            self.entries[key] = {'summary': result['summary'], 'category': result['category']}
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+            self.dirty = True
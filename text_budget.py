@@ -0,0 +1,138 @@
+import re
+import threading
+from config import SUMMARY_MODEL, SUMMARY_INPUT_TOKEN_BUDGET
+from logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Whole segments that are site chrome rather than article content. Only
+# complete chrome phrases match, never sentences that merely mention a word
+# like "newsletter" or "cookies"; credit and copyright lines stop at the
+# first sentence end so they can't swallow a following sentence
+BOILERPLATE = re.compile(
+    r'^(advertisement|sponsored( content)?|skip to (main )?content|share( this( article| story)?)?( on \w+)?|'
+    r'(sign up|subscribe)( now| today)?(( for| to) (our|the) ([\w-]+ ){0,3}newsletters?)?|'
+    r'follow us( on \w+)?|read more|click here( to [\w ]+)?|'
+    r'related( articles| stories| coverage)?|recommended( for you)?|'
+    r'all rights reserved|(©|copyright( ©)?) ?\d{4}[^.!?]*(\. all rights reserved)?|'
+    r'(accept|manage)( all)? cookies|(we use|this (web)?site uses) cookies( to [^.!?]*)?|'
+    r'(photo|image)( credit)?:[^.!?]*|getty images|ap photo[^.!?]*)[.:!]?$',
+    re.IGNORECASE
+)
+# Boilerplate checks only apply to short segments
+BOILERPLATE_MAX_WORDS = 25
+MIN_SEGMENT_WORDS = 3
+
+TAG = re.compile(r'<[^>]+>')
+SPACE_BEFORE_PUNCTUATION = re.compile(r'\s+([.,;:!?])')
+WHITESPACE = re.compile(r'[ \t\r\f\v\u00a0]+')
+PARAGRAPH_BREAK = re.compile(r'\s*\n\s*')
+# Extracted page text is joined with single spaces, so fall back to sentence boundaries
+SENTENCE_BREAK = re.compile(r'(?<=[.!?"”])\s+(?=["“]?[A-Z0-9©])')
+
+CHARS_PER_TOKEN = 4
+
+
+class TokenCounter:
+    """Counts tokens with tiktoken when available, otherwise estimates ~4 characters per token"""
+
+    def __init__(self, model=SUMMARY_MODEL):
+        self.encoding = None
+        try:
+            import tiktoken
+        except ImportError:  # Token counts fall back to a character estimate
+            return
+        try:
+            try:
+                self.encoding = tiktoken.encoding_for_model(model)
+            except KeyError:
+                self.encoding = tiktoken.get_encoding('o200k_base')
+        except Exception as e:
+            # Encodings are downloaded on first use, which can fail offline
+            logger.warning(f"tiktoken unavailable ({str(e)}), estimating token counts")
+
+    def count(self, text):
+        if self.encoding is not None:
+            return len(self.encoding.encode(text, disallowed_special=()))
+        return -(-len(text) // CHARS_PER_TOKEN)
+
+    def truncate(self, text, max_tokens):
+        """Cut text down to at most max_tokens, preferring a word boundary"""
+        if self.encoding is not None:
+            tokens = self.encoding.encode(text, disallowed_special=())
+            if len(tokens) <= max_tokens:
+                return text
+            text = self.encoding.decode(tokens[:max_tokens])
+        elif len(text) > max_tokens * CHARS_PER_TOKEN:
+            text = text[:max_tokens * CHARS_PER_TOKEN]
+        else:
+            return text
+        return text.rsplit(' ', 1)[0] if ' ' in text else text
+
+
+_counter = None
+_counter_lock = threading.Lock()
+
+
+def get_token_counter():
+    """Return the shared TokenCounter, loading the encoding only once per process"""
+    global _counter
+    if _counter is None:
+        with _counter_lock:
+            if _counter is None:
+                _counter = TokenCounter()
+    return _counter
+
+
+def split_segments(text):
+    """Split text into paragraphs, or into sentences when it has no line breaks"""
+    paragraphs = [p for p in PARAGRAPH_BREAK.split(text) if p]
+    if len(paragraphs) > 1:
+        return paragraphs
+    return [s for s in SENTENCE_BREAK.split(text) if s]
+
+
+def is_boilerplate(segment):
+    words = len(segment.split())
+    if words < MIN_SEGMENT_WORDS and not segment.endswith(('.', '!', '?')):
+        return True
+    return words <= BOILERPLATE_MAX_WORDS and bool(BOILERPLATE.match(segment))
+
+
+def fit_to_budget(text, budget=SUMMARY_INPUT_TOKEN_BUDGET, counter=None):
+    """Clean article text and keep its leading segments within a token budget.
+
+    Removes markup, whitespace runs, boilerplate and repeated segments, then
+    keeps segments in order (news articles lead with the key facts) until
+    the budget is reached. Returns (text, original_tokens, kept_tokens).
+    """
+    counter = counter or get_token_counter()
+    text = text or ''
+    original_tokens = counter.count(text)
+
+    # Chrome is only dropped as whole segments (is_boilerplate); sentences are never rewritten
+    cleaned = TAG.sub(' ', text)
+    cleaned = SPACE_BEFORE_PUNCTUATION.sub(r'\1', WHITESPACE.sub(' ', cleaned)).strip()
+    kept = []
+    seen = set()
+    used = 0
+    for segment in split_segments(cleaned):
+        segment = segment.strip()
+        key = segment.lower()
+        if not segment or key in seen or is_boilerplate(segment):
+            continue
+        seen.add(key)
+
+        # Count the separator too so the joined text stays within budget
+        tokens = counter.count(segment) + (1 if kept else 0)
+        if used + tokens > budget:
+            if not kept:
+                # A single oversized lead segment is cut rather than dropped
+                kept.append(counter.truncate(segment, budget))
+            break
+        kept.append(segment)
+        used += tokens
+
+    # Fall back to the cleaned text when every segment looked like boilerplate
+    result = ' '.join(kept) if kept else counter.truncate(cleaned, budget)
+    return result, original_tokens, counter.count(result)
@@ -0,0 +1,48 @@
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+# Query parameters that only track where a click came from, never which article it is
+TRACKING_PARAMS = {
+    'fbclid', 'gclid', 'dclid', 'msclkid', 'igshid', 'yclid',
+    'mc_cid', 'mc_eid', 'cmpid', 'ncid', 'smid', 'smtyp',
+    'ref', 'ref_src', 'referrer', 'mod', 'section', 'rss', 'feed', 'partner',
+    'guccounter', 'guce_referrer', 'guce_referrer_sig', '_ga', '_gl', 'spm'
+}
+TRACKING_PREFIXES = ('utm_', 'at_', 'pk_', 'mtm_', 'itm_')
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+def canonicalize_url(url):
+    """Normalize an article URL so the same story under different links compares equal.
+
+    Lowercases the host, treats http and https alike, drops default ports,
+    'www.', fragments, trailing slashes and tracking parameters, and sorts
+    the remaining query parameters.
+    """
+    url = (url or '').strip()
+    try:
+        parts = urlsplit(url)
+        port = parts.port
+    except ValueError:
+        return url
+    scheme = parts.scheme.lower()
+    if scheme not in DEFAULT_PORTS or not parts.hostname:
+        return url
+
+    host = parts.hostname.lower().rstrip('.')
+    if host.startswith('www.'):
+        host = host[4:]
+    if port and port != DEFAULT_PORTS[scheme]:
+        host = f"{host}:{port}"
+
+    path = parts.path or '/'
+    while '//' in path:
+        path = path.replace('//', '/')
+    if len(path) > 1:
+        path = path.rstrip('/')
+
+    query = sorted(
+        (key, value)
+        for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if key.lower() not in TRACKING_PARAMS and not key.lower().startswith(TRACKING_PREFIXES)
+    )
+    return urlunsplit(('https', host, path, urlencode(query), ''))